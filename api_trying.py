@@ -2,47 +2,277 @@ from flask import Flask, request, jsonify
 import cv2
 import numpy as np
 import base64
-from facial_landmarks import EnhancedFacialParalysisAnalyzer
+import os
+import time
+from functools import partial
+from facial_landmarks import EnhancedFacialParalysisAnalyzer, batch_report
+from worker_pool import PoolBusyError, pool_from_env
+from landmark_cache import cache_from_env
+from face_detectors import detector_from_env
+from face_finder import parse_face_boxes, parse_max_faces
+from model_registry import get_shape_predictor, registry
+from job_queue import InvalidCallbackError, LazyJobQueue, QueueFullError, job_queue_from_env
+from artifact_store import artifact_store_from_env
+from image_io import decode_base64, preview_settings_from_env, read_stream, upload_settings_from_env
+from image_quality import quality_gate_from_env
+from metrics import instrument_app, metrics, record_stage
 
 app = Flask(__name__)
-analyzer = EnhancedFacialParalysisAnalyzer("shape_predictor_68_face_landmarks.dat")
+# Request latency histograms and the per-stage analysis metrics are served at /metrics
+instrument_app(app)
+# Larger request bodies (FACIPA_MAX_UPLOAD_MB) are refused with 413 before they are read
+upload_settings = upload_settings_from_env()
+app.config['MAX_CONTENT_LENGTH'] = upload_settings['max_bytes']
+
+PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
+
+# Face detector backend and downscaling come from FACIPA_DETECTOR / FACIPA_DETECTION_WIDTH
+detector = detector_from_env()
+model_loaders = [partial(get_shape_predictor, PREDICTOR_PATH), detector.load_model]
+
+# With FACIPA_WORKERS set, analyses run in worker processes. Models are loaded before the
+# workers fork so they share them; otherwise they warm up in the background.
+# Visualizations are returned as FACIPA_VIS_FORMAT (JPEG by default) at most FACIPA_VIS_WIDTH wide.
+# FACIPA_QUALITY_GATE flags (or, set to reject, rejects) blurry images and badly exposed or tiny faces.
+analyzer_factory = partial(EnhancedFacialParalysisAnalyzer, PREDICTOR_PATH,
+                           detector=detector, cache=cache_from_env(), preview=preview_settings_from_env(),
+                           quality=quality_gate_from_env())
+pool = pool_from_env(analyzer_factory, preload=model_loaders)
+analyzer = analyzer_factory() if pool is None else None
+if pool is None:
+    registry.warm_up(*model_loaders)
+
+RESULTS_DIR = 'static/results'
+# Kept visualizations get unique names and are evicted by size and age
+artifacts = artifact_store_from_env(RESULTS_DIR)
+
+def run_analysis(method, *args, **kwargs):
+    """Call an analyzer method in-process or on the worker pool"""
+    if pool is not None:
+        return pool.call(method, *args, **kwargs)
+    return getattr(analyzer, method)(*args, **kwargs)
+
+def run_batch(images, visualize=False, max_faces=1):
+    """process_batch() in-process, or one process_image task per image spread over the worker pool
+
+    Results keep the request order. Batches of any size share the pool: once
+    the first image is queued, each further image waits for a free slot,
+    which the batch's own finished images release. A PoolBusyError for the
+    first image (every slot taken by other requests) is raised to the caller.
+    """
+    if pool is None:
+        return analyzer.process_batch(images, visualize=visualize, max_faces=max_faces)
+
+    batch_start = time.perf_counter()
+    futures = []
+    try:
+        for image in images:
+            futures.append(pool.submit('process_image', image, visualize=visualize, max_faces=max_faces,
+                                       slot_timeout=None if futures else 0))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    results = [future.result() for future in futures]
+    return batch_report(results, time.perf_counter() - batch_start)
+
+def busy_response(error):
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
+def read_image_bytes(payload):
+    """Return the uploaded image, or None
+
+    In order of preference the image is the multipart 'image' file, a raw
+    image/* or application/octet-stream request body, or the 'image_base64'
+    JSON field. The binary forms avoid holding the JSON text, its base64
+    string and the decoded bytes in memory at once.
+    """
+    if 'image' in request.files:
+        return request.files['image'].read()
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return read_stream(request.stream)
+    if 'image_base64' in payload:
+        return decode_base64(payload['image_base64'])
+    return None
+
+def encode_visualization(results, trace=False):
+    """Replace the encoded visualization in the results with a base64 string for JSON
+
+    The analysis trace is recorded in the metrics and only left in the
+    results when `trace` is set.
+    """
+    stages = results['trace']['stages']
+    visualization = results.pop('visualization', None)
+    results.pop('visualization_ext', None)
+    if visualization is not None:
+        stage_start = time.perf_counter()
+        results['visualization_base64'] = base64.b64encode(visualization).decode('utf-8')
+        record_stage(stages, 'base64', stage_start)
+
+    analysis_trace = results.pop('trace')
+    metrics.observe_trace(analysis_trace)
+    if trace:
+        results['trace'] = {'stages': {stage: round(seconds, 6) for stage, seconds in stages.items()},
+                            'image': analysis_trace['image']}
+    return results
+
+def analyze_bytes(image_bytes, keep_results=False, visualize=True, max_faces=1, trace=False, face_boxes=None):
+    # Analyze the image straight from memory; the visualization is only rendered when needed
+    results = run_analysis('process_image', image_bytes, visualize=visualize or keep_results,
+                           max_faces=max_faces, face_boxes=face_boxes)
+
+    # Only write the visualization to disk when asked to keep it
+    stage_start = time.perf_counter()
+    if keep_results and 'visualization' in results:
+        results['visualization_path'] = artifacts.save(results['visualization'], results['visualization_ext'])
+        record_stage(results['trace']['stages'], 'store', stage_start)
+    if not visualize:
+        results.pop('visualization', None)
+        results.pop('visualization_mime', None)
+    return encode_visualization(results, trace)
+
+def error_status(results):
+    """HTTP status for an analysis that reported an error, matching web_app
+
+    Undecodable images are the client's error (400); images that decode but
+    are rejected by the quality gate or hold no face are unprocessable (422).
+    """
+    return 400 if results['error'] == 'Could not decode image' else 422
+
+def run_job(image_bytes, options):
+    results = analyze_bytes(image_bytes, **options)
+    # As in web_app, undecodable uploads fail the job while rejections are its result
+    if 'error' in results and error_status(results) == 400:
+        raise ValueError(results['error'])
+    return results
+
+# Background jobs are retried while the worker pool is full. The queue's database (under FACIPA_DATA_DIR)
+# and worker threads are only created when it is first used.
+jobs = LazyJobQueue(partial(job_queue_from_env, run_job, database='api_jobs.db', retry_exceptions=(PoolBusyError,)))
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({'error': 'Image too large', 'max_bytes': upload_settings['max_bytes']}), 413
 
 @app.route('/analyze', methods=['POST'])
 def analyze_facial_paralysis():
+    payload = request.get_json(silent=True) or {}
     try:
-        if 'image' not in request.files and 'image_base64' not in request.json:
-            return jsonify({'error': 'No image provided'}), 400
-        
-        if 'image' in request.files:
-            image_file = request.files['image']
-            image_path = f"temp_{image_file.filename}"
-            image_file.save(image_path)
-        else:
-            # Handle base64 image
-            image_data = request.json['image_base64']
-            image_data = image_data.split(',')[1] if ',' in image_data else image_data
-            image_bytes = base64.b64decode(image_data)
-            image_path = "temp_image.jpg"
-            with open(image_path, 'wb') as f:
-                f.write(image_bytes)
-        
-        # Analyze the image
-        results = analyzer.process_image(image_path)
-        
-        # Include visualization as base64
-        if 'visualization_path' in results:
-            with open(results['visualization_path'], 'rb') as f:
-                visualization_base64 = base64.b64encode(f.read()).decode('utf-8')
-            results['visualization_base64'] = visualization_base64
-        
+        max_faces = parse_max_faces(request.values.get('faces', payload.get('faces')))
+        # Boxes from a detector the client already ran skip server-side detection
+        face_boxes = parse_face_boxes(request.values.getlist('face_box') or payload.get('face_boxes', []))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        image_bytes = read_image_bytes(payload)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid image_base64: {e}"}), 400
+    if image_bytes is None:
+        return jsonify({'error': 'No image provided'}), 400
+
+    try:
+        results = analyze_bytes(image_bytes, keep_results=request.values.get('keep_results') == '1',
+                                visualize=request.values.get('visualize', '1') == '1', max_faces=max_faces,
+                                trace=request.values.get('trace') == '1', face_boxes=face_boxes)
+        if 'error' in results:
+            return jsonify(results), error_status(results)
         return jsonify(results)
-    
+
+    except PoolBusyError as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    payload = request.get_json(silent=True) or {}
+    try:
+        max_faces = parse_max_faces(request.values.get('faces', payload.get('faces')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if 'images' in request.files:
+            images = [image_file.read() for image_file in request.files.getlist('images')]
+        else:
+            encoded = payload.get('images_base64', [])
+            if not isinstance(encoded, list):
+                return jsonify({'error': 'images_base64 must be a list of base64 strings'}), 400
+            images = []
+            for index, data in enumerate(encoded):
+                try:
+                    images.append(decode_base64(data))
+                except ValueError as e:
+                    return jsonify({'error': f"Invalid image_base64 at index {index}: {e}"}), 400
+
+        if not images:
+            return jsonify({'error': 'No images provided'}), 400
+
+        visualize = request.values.get('visualize') == '1'
+        batch = run_batch(images, visualize=visualize, max_faces=max_faces)
+
+        trace = request.values.get('trace') == '1'
+        for results in batch['results']:
+            encode_visualization(results, trace)
+
+        return jsonify(batch)
+
+    except PoolBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    payload = request.get_json(silent=True) or {}
+    try:
+        image_bytes = read_image_bytes(payload)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid image_base64: {e}"}), 400
+    if image_bytes is None:
+        return jsonify({'error': 'No image provided'}), 400
+
+    try:
+        options = {
+            'keep_results': request.values.get('keep_results') == '1',
+            'visualize': request.values.get('visualize', '1') == '1',
+            'trace': request.values.get('trace') == '1',
+            'max_faces': parse_max_faces(request.values.get('faces', payload.get('faces'))),
+            'face_boxes': parse_face_boxes(request.values.getlist('face_box') or payload.get('face_boxes', []))
+        }
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    callback_url = payload.get('callback_url') or request.values.get('callback_url')
+    try:
+        job_id = jobs.submit(image_bytes, options, callback_url=callback_url)
+    except InvalidCallbackError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f"/jobs/{job_id}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'Facial Paralysis Analysis'})
+    status = registry.status()
+    # A failed model load never recovers by waiting, so report it as unavailable
+    if status['state'] == 'failed':
+        return jsonify({'status': 'failed', 'service': 'Facial Paralysis Analysis', **status}), 503
+    return jsonify({'status': 'healthy' if status['ready'] else 'warming_up',
+                    'service': 'Facial Paralysis Analysis', **status})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # The reloader would start a second copy of the worker pool
+    use_reloader = pool is None
+    # Resume queued jobs at startup; with the reloader only the serving child runs them
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        jobs.start()
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=use_reloader)
@@ -0,0 +1,98 @@
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Names written by ArtifactStore.save(); anything else in the directory is left alone
+_ARTIFACT_NAME = re.compile(r'^\w+_\d{8}_\d{6}_[0-9a-f]{12}\.\w+$')
+
+
+class ArtifactStore:
+    def __init__(self, root='static/results', max_bytes=None, max_age_seconds=None, sweep_interval=60):
+        """Directory of saved visualizations with size and age based eviction
+
+        Every artifact gets a unique name, so concurrent requests never
+        overwrite each other. After a save, files older than
+        `max_age_seconds` are removed. Then the oldest files go until the
+        directory fits in `max_bytes`. The directory is swept at most once
+        every `sweep_interval` seconds. None disables a limit. Only files
+        named by save() are counted and evicted.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def save(self, data, ext='.png', prefix='analysis'):
+        """Write encoded image bytes under a collision-free name and return the path"""
+        os.makedirs(self.root, exist_ok=True)
+        name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}{ext}"
+        path = os.path.join(self.root, name)
+        # Write to a temporary file first so the static route never serves a partial image
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.root) as scanner:
+            for entry in scanner:
+                if not entry.is_file() or not _ARTIFACT_NAME.match(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Apply the age and size limits now and return the number of files removed"""
+        with self._lock:
+            self._last_sweep = time.monotonic()
+            if not os.path.isdir(self.root) or (self.max_bytes is None and self.max_age_seconds is None):
+                return 0
+
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            cutoff = time.time() - self.max_age_seconds if self.max_age_seconds is not None else None
+            removed = 0
+            # Oldest first: expired files, then whatever is still over the size budget
+            for mtime, size, path in entries:
+                expired = cutoff is not None and mtime < cutoff
+                oversize = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or oversize):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            return removed
+
+    def stats(self):
+        entries = self._entries() if os.path.isdir(self.root) else []
+        return {'files': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'max_age_seconds': self.max_age_seconds}
+
+
+def artifact_store_from_env(root='static/results'):
+    """Create the store from FACIPA_ARTIFACT_DIR / FACIPA_ARTIFACT_MAX_MB / FACIPA_ARTIFACT_MAX_AGE_HOURS
+
+    Limits default to 500 MB and 7 days; set a limit to 0 to disable it.
+    """
+    max_mb = float(os.environ.get('FACIPA_ARTIFACT_MAX_MB', '500'))
+    max_age_hours = float(os.environ.get('FACIPA_ARTIFACT_MAX_AGE_HOURS', str(7 * 24)))
+    return ArtifactStore(os.environ.get('FACIPA_ARTIFACT_DIR', root),
+                         max_bytes=int(max_mb * 1024 * 1024) if max_mb > 0 else None,
+                         max_age_seconds=max_age_hours * 3600 if max_age_hours > 0 else None)
@@ -0,0 +1,88 @@
+"""Latency and landmark deviation of downscaled face detection versus full resolution
+
+Run from the repository root:
+
+    python benchmarks/bench_detection_pyramid.py --widths 320 480 640 --upscale 4
+
+`--upscale` enlarges the sample images to approximate phone-camera photos.
+Landmark deviation is the mean point distance to the full-resolution
+landmarks, normalized by the inter-ocular distance.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facial_landmarks import EnhancedFacialParalysisAnalyzer
+
+
+def predict_landmarks(analyzer, gray):
+    """Return (seconds, landmarks of the first face or None)"""
+    start = time.perf_counter()
+    faces = analyzer.detect_faces(gray)
+    landmarks = None
+    if len(faces) > 0:
+        shape = analyzer.predictor(gray, faces[0])
+        landmarks = np.array([(shape.part(i).x, shape.part(i).y) for i in range(68)], dtype=np.float64)
+    return time.perf_counter() - start, landmarks
+
+
+def load_grays(pattern, upscale):
+    grays = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        if upscale != 1:
+            image = cv2.resize(image, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        grays.append(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    return grays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--widths', type=int, nargs='+', default=[320, 480, 640])
+    parser.add_argument('--images', default='static/results/*.png', help='glob of input images')
+    parser.add_argument('--upscale', type=float, default=1.0)
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    args = parser.parse_args()
+
+    grays = load_grays(args.images, args.upscale)
+    if not grays:
+        parser.error(f"No images match {args.images}")
+
+    analyzer = EnhancedFacialParalysisAnalyzer(args.shape_predictor)
+    reference = [predict_landmarks(analyzer, gray) for gray in grays]
+    found = sum(landmarks is not None for _, landmarks in reference)
+    print(f"{len(grays)} images of {grays[0].shape[1]}x{grays[0].shape[0]}, "
+          f"{found} faces at full resolution")
+
+    print(f"{'mode':>10} {'mean ms':>9} {'speedup':>8} {'found':>6} {'deviation':>10}")
+    full_ms = 1000 * np.mean([seconds for seconds, _ in reference])
+    print(f"{'full':>10} {full_ms:>9.1f} {1:>7.2f}x {found:>6} {0:>10.4f}")
+
+    for width in args.widths:
+        analyzer.face_detector.detection_width = width
+        timings, deviations, matched = [], [], 0
+        for gray, (_, full_landmarks) in zip(grays, reference):
+            seconds, landmarks = predict_landmarks(analyzer, gray)
+            timings.append(seconds)
+            if landmarks is None or full_landmarks is None:
+                continue
+            matched += 1
+            inter_ocular = np.linalg.norm(full_landmarks[36:42].mean(axis=0) - full_landmarks[42:48].mean(axis=0))
+            deviations.append(np.linalg.norm(landmarks - full_landmarks, axis=1).mean() / inter_ocular)
+
+        mean_ms = 1000 * np.mean(timings)
+        deviation = np.mean(deviations) if deviations else float('nan')
+        print(f"{width:>10} {mean_ms:>9.1f} {full_ms / mean_ms:>7.2f}x {matched:>6} {deviation:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
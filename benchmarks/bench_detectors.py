@@ -0,0 +1,154 @@
+"""Latency, recall and landmark error of the face detector backends on a labelled image set
+
+Run from the repository root:
+
+    python benchmarks/bench_detectors.py --labels data/faces/labels.json --backends hog haar dnn cnn
+
+The labels file maps image paths (relative to the file) to ground truth:
+
+    {"patient_001.jpg": {"boxes": [[left, top, right, bottom], ...],
+                         "landmarks": [[[x, y], ... 68 points], ...]}}
+
+"landmarks" is optional. A detection counts as a hit when its IoU with a
+labelled box is at least --iou. Landmark error is the mean point distance
+of the shape predictor run on the detected box, normalized by the labelled
+inter-ocular distance. Use --bootstrap to write a labels file from one
+backend's output for manual review.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_detectors import create_detector, to_dlib_rectangle
+
+
+def iou(a, b):
+    left, top = max(a[0], b[0]), max(a[1], b[1])
+    right, bottom = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def predict(predictor, gray, box):
+    shape = predictor(gray, to_dlib_rectangle(box))
+    return np.array([(shape.part(i).x, shape.part(i).y) for i in range(68)], dtype=np.float64)
+
+
+def evaluate(detector, samples, predictor, iou_threshold):
+    timings, errors = [], []
+    labelled, hits = 0, 0
+    for image, gray, label in samples:
+        start = time.perf_counter()
+        boxes = detector.detect(image)
+        timings.append(time.perf_counter() - start)
+
+        for index, truth in enumerate(label['boxes']):
+            labelled += 1
+            overlaps = [iou(truth, box) for box in boxes]
+            if not overlaps or max(overlaps) < iou_threshold:
+                continue
+            hits += 1
+
+            truth_landmarks = label.get('landmarks')
+            if truth_landmarks:
+                truth_points = np.asarray(truth_landmarks[index], dtype=np.float64)
+                points = predict(predictor, gray, boxes[int(np.argmax(overlaps))])
+                inter_ocular = np.linalg.norm(truth_points[36:42].mean(axis=0) - truth_points[42:48].mean(axis=0))
+                errors.append(np.linalg.norm(points - truth_points, axis=1).mean() / inter_ocular)
+
+    timings_ms = 1000 * np.array(timings)
+    return {
+        'mean_ms': float(timings_ms.mean()),
+        'p95_ms': float(np.percentile(timings_ms, 95)),
+        'recall': hits / labelled if labelled else float('nan'),
+        'landmark_error': float(np.mean(errors)) if errors else float('nan')
+    }
+
+
+def load_samples(labels_path):
+    with open(labels_path) as f:
+        labels = json.load(f)
+    root = os.path.dirname(os.path.abspath(labels_path))
+    samples = []
+    for name, label in sorted(labels.items()):
+        image = cv2.imread(os.path.join(root, name))
+        if image is not None:
+            samples.append((image, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), label))
+    return samples
+
+
+def bootstrap(detector, predictor, pattern, output):
+    labels = {}
+    root = os.path.dirname(os.path.abspath(output))
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = [[int(round(value)) for value in box] for box in detector.detect(image)]
+        labels[os.path.relpath(os.path.abspath(path), root)] = {
+            'boxes': boxes,
+            'landmarks': [predict(predictor, gray, box).astype(int).tolist() for box in boxes]
+        }
+    with open(output, 'w') as f:
+        json.dump(labels, f)
+    print(f"Wrote {len(labels)} images to {output}; review the boxes before benchmarking against them")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--labels', required=True, help='labels JSON file')
+    parser.add_argument('--backends', nargs='+', default=['hog', 'haar'])
+    parser.add_argument('--detection-width', type=int, default=0)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--min-recall', type=float, default=0.95, help='accuracy floor for the recommendation')
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    parser.add_argument('--dnn-prototxt', default='deploy.prototxt')
+    parser.add_argument('--dnn-model', default='res10_300x300_ssd_iter_140000.caffemodel')
+    parser.add_argument('--cnn-model', default='mmod_human_face_detector.dat')
+    parser.add_argument('--bootstrap', metavar='GLOB', help='write --labels from the first backend on these images')
+    args = parser.parse_args()
+
+    model_options = {
+        'dnn': {'prototxt_path': args.dnn_prototxt, 'model_path': args.dnn_model},
+        'cnn': {'model_path': args.cnn_model},
+    }
+    detectors = [create_detector(name, detection_width=args.detection_width or None, **model_options.get(name, {}))
+                 for name in args.backends]
+    predictor = dlib.shape_predictor(args.shape_predictor)
+
+    if args.bootstrap:
+        bootstrap(detectors[0], predictor, args.bootstrap, args.labels)
+        return
+
+    samples = load_samples(args.labels)
+    if not samples:
+        parser.error(f"No readable images listed in {args.labels}")
+
+    results = {}
+    print(f"{'backend':>8} {'mean ms':>9} {'p95 ms':>9} {'recall':>7} {'lm error':>9}")
+    for detector in detectors:
+        result = results[detector.name] = evaluate(detector, samples, predictor, args.iou)
+        print(f"{detector.name:>8} {result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['recall']:>7.3f} {result['landmark_error']:>9.4f}")
+
+    eligible = [name for name, result in results.items() if result['recall'] >= args.min_recall]
+    if eligible:
+        fastest = min(eligible, key=lambda name: results[name]['mean_ms'])
+        print(f"Fastest backend with recall >= {args.min_recall}: {fastest}")
+    else:
+        print(f"No backend reaches recall {args.min_recall}")
+
+
+if __name__ == '__main__':
+    main()
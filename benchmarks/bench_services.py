@@ -0,0 +1,396 @@
+"""Per-stage latency of the analyzers and HTTP load test of both Flask services
+
+Run from the repository root:
+
+    python benchmarks/bench_services.py --output bench/HEAD.json
+    python benchmarks/bench_services.py --sizes 640 1600 4000 --concurrency 1 4 8 --requests 200
+    python benchmarks/bench_services.py --output bench/new.json --compare bench/HEAD.json --fail-on-regression
+
+The corpus is built in memory from the --images glob: every image is
+resized so its longer side is each of --sizes pixels (0 keeps the original
+size) and JPEG-encoded. The same inputs always give the same corpus, and
+its fingerprint is saved with the results so that comparisons across
+commits only compare like with like.
+
+Three in-process benchmarks time every stage reported by:
+- EnhancedFacialParalysisAnalyzer.process_image (facial_landmarks)
+- FacialParalysisAnalyzer.analyze_image (web_app)
+- resim_analiz (notAPI), which reads the images from a temporary directory
+
+For the load test, web_app.py and api_trying.py are started as separate
+server processes. Once /health reports the models are loaded, concurrent
+clients POST the corpus to /analyze. Throughput and p50/p95/p99 latency
+are reported for every --concurrency level. Use --url name=http://host:port
+to load test an already running service instead.
+
+The landmark cache is disabled everywhere unless --keep-cache is given,
+since the repeated corpus would otherwise measure cache hits.
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVICES = ('web_app', 'api_trying')
+ANALYZERS = ('process_image', 'analyze_image', 'resim_analiz')
+
+
+def load_corpus(pattern, sizes, quality=90):
+    """Return [(name, JPEG bytes)] for every image matching `pattern` at every size"""
+    corpus = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for size in sizes:
+            resized = image
+            longest = max(image.shape[:2])
+            if size and size != longest:
+                scale = size / longest
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+                resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+            success, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if success:
+                corpus.append((f"{stem}@{size or longest}.jpg", buffer.tobytes()))
+    return corpus
+
+
+def fingerprint(corpus):
+    digest = hashlib.sha256()
+    for name, data in corpus:
+        digest.update(name.encode())
+        digest.update(data)
+    return digest.hexdigest()[:16]
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds"""
+    if not seconds:
+        return {'count': 0}
+    ms = 1000 * np.asarray(seconds, dtype=np.float64)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'count': len(ms), 'mean_ms': round(float(ms.mean()), 3), 'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3), 'p99_ms': round(float(p99), 3), 'max_ms': round(float(ms.max()), 3)}
+
+
+def time_stages(analyze, inputs, repeat, warmup):
+    """Run `analyze(input) -> (stages, outcome)` over the inputs and summarize the total and every stage"""
+    for item in inputs[:warmup]:
+        analyze(item)
+
+    totals, stages, outcomes = [], {}, Counter()
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            item_stages, outcome = analyze(item)
+            totals.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+            for stage, seconds in item_stages.items():
+                stages.setdefault(stage, []).append(seconds)
+    return {'total': summarize(totals), 'stages': {stage: summarize(values) for stage, values in stages.items()},
+            'outcomes': dict(outcomes)}
+
+
+def bench_analyzers(corpus, names, args):
+    from face_detectors import detector_from_env
+    from image_io import preview_settings_from_env
+    from image_quality import quality_gate_from_env
+
+    cache = None
+    if args.keep_cache:
+        from landmark_cache import cache_from_env
+        cache = cache_from_env()
+    images = [data for _, data in corpus]
+    results = {}
+
+    if 'process_image' in names:
+        from facial_landmarks import EnhancedFacialParalysisAnalyzer
+        analyzer = EnhancedFacialParalysisAnalyzer(args.shape_predictor, detector=detector_from_env(), cache=cache,
+                                                   preview=preview_settings_from_env(), quality=quality_gate_from_env())
+
+        def process_image(data):
+            output = analyzer.process_image(data, visualize=not args.no_visualize)
+            return output['trace']['stages'], output.get('error', 'ok')
+
+        results['process_image'] = time_stages(process_image, images, args.repeat, args.warmup)
+
+    if 'analyze_image' in names:
+        import web_app
+        analyzer = web_app.FacialParalysisAnalyzer(cache=cache, preview=preview_settings_from_env(),
+                                                   quality=quality_gate_from_env())
+
+        def analyze_image(data):
+            output = analyzer.analyze_image(data, visualize=not args.no_visualize)
+            outcome = output.get('error') or ('ok' if output['landmarks_detected'] else 'No face detected')
+            return output['trace']['stages'], outcome
+
+        results['analyze_image'] = time_stages(analyze_image, images, args.repeat, args.warmup)
+
+    if 'resim_analiz' in names:
+        import notAPI
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, data in corpus:
+                paths.append(os.path.join(directory, name))
+                with open(paths[-1], 'wb') as f:
+                    f.write(data)
+
+            def resim_analiz(path):
+                stages = {}
+                with contextlib.redirect_stdout(io.StringIO()):
+                    durum = notAPI.resim_analiz(path, args.shape_predictor, timings=stages, show=False)
+                return stages, 'ok' if durum['faces'] else 'No face detected'
+
+            results['resim_analiz'] = time_stages(resim_analiz, paths, args.repeat, args.warmup)
+
+    return results
+
+
+def multipart(fields, files):
+    """Encode form fields and (field, filename, bytes) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: image/jpeg\r\n\r\n'.encode())
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def post(url, body, content_type, timeout):
+    """Return (seconds, HTTP status or an error name)"""
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError) as e:
+        status = type(e).__name__
+    return time.perf_counter() - start, status
+
+
+def load_test(base_url, corpus, concurrency, requests, args):
+    fields = {'visualize': '0' if args.no_visualize else '1'}
+    bodies = [multipart(fields, [('image', name, data)]) for name, data in corpus]
+    payloads = [bodies[i % len(bodies)] for i in range(requests)]
+    url = f"{base_url}/analyze"
+
+    for body, content_type in bodies[:args.warmup]:
+        post(url, body, content_type, args.timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        replies = list(clients.map(lambda payload: post(url, *payload, args.timeout), payloads))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(str(status) for _, status in replies)
+    succeeded = [seconds for seconds, status in replies if status == 200]
+    return {'concurrency': concurrency, 'requests': requests, 'seconds': round(elapsed, 3),
+            'throughput_rps': round(len(succeeded) / elapsed, 3), 'statuses': dict(statuses),
+            'latency': summarize(succeeded)}
+
+
+@contextlib.contextmanager
+def run_service(module, port, args, log):
+    """Start `module`.app on `port` in its own process and wait until /health reports it ready"""
+    env = dict(os.environ)
+    if not args.keep_cache:
+        env['FACIPA_CACHE_SIZE'] = '0'
+    code = f"import {module}; {module}.app.run(host='127.0.0.1', port={port}, threaded=True)"
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=log, stderr=log)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + args.startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited with code {process.returncode}, see {log.name}")
+            try:
+                with urllib.request.urlopen(f"{base_url}/health", timeout=5) as response:
+                    if json.load(response).get('status') == 'healthy':
+                        break
+            except (urllib.error.URLError, OSError, ValueError):
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{module} did not become healthy within {args.startup_timeout}s")
+            time.sleep(0.5)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def bench_http(corpus, args):
+    targets = dict(url.split('=', 1) for url in args.url) if args.url else None
+    results = {}
+    with tempfile.NamedTemporaryFile('w', prefix='bench_services_', suffix='.log', delete=False) as log:
+        for offset, name in enumerate(args.services):
+            if targets is not None and name not in targets:
+                continue
+            with (contextlib.nullcontext(targets[name].rstrip('/')) if targets is not None
+                  else run_service(name, args.port + offset, args, log)) as base_url:
+                results[name] = [load_test(base_url, corpus, concurrency, args.requests, args)
+                                 for concurrency in args.concurrency]
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--'], cwd=ROOT).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def flatten(report):
+    """{metric name: (value, higher is better)} for the numbers worth comparing across runs"""
+    metrics = {}
+    for analyzer, result in report.get('analyzers', {}).items():
+        for key in ('p50_ms', 'p95_ms'):
+            if key in result['total']:
+                metrics[f"{analyzer} total {key}"] = (result['total'][key], False)
+        for stage, summary in result['stages'].items():
+            if 'p50_ms' in summary:
+                metrics[f"{analyzer} {stage} p50_ms"] = (summary['p50_ms'], False)
+    for service, levels in report.get('http', {}).items():
+        for level in levels:
+            prefix = f"{service} c={level['concurrency']}"
+            metrics[f"{prefix} throughput_rps"] = (level['throughput_rps'], True)
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if key in level['latency']:
+                    metrics[f"{prefix} {key}"] = (level['latency'][key], False)
+    return metrics
+
+
+def compare(report, baseline, tolerance):
+    """Print the change of every shared metric and return the names of those that regressed"""
+    if report['corpus']['fingerprint'] != baseline['corpus']['fingerprint']:
+        print("warning: the baseline was measured on a different corpus")
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<44} {baseline.get('revision') or 'baseline':>14} {report.get('revision') or 'current':>14} "
+          f"{'change':>8}")
+    for name in sorted(set(current) & set(previous)):
+        (value, higher_is_better), (old, _) = current[name], previous[name]
+        change = (value - old) / old if old else 0.0
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44} {old:>14.2f} {value:>14.2f} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def print_report(report):
+    for analyzer, result in report.get('analyzers', {}).items():
+        total = result['total']
+        print(f"\n{analyzer}: {total.get('count', 0)} runs, p50 {total.get('p50_ms', 0):.1f} ms, "
+              f"p95 {total.get('p95_ms', 0):.1f} ms, outcomes {result['outcomes']}")
+        for stage, summary in sorted(result['stages'].items(), key=lambda item: -item[1].get('mean_ms', 0)):
+            print(f"  {stage:<16} mean {summary['mean_ms']:>9.2f} ms   p95 {summary['p95_ms']:>9.2f} ms")
+    for service, levels in report.get('http', {}).items():
+        print(f"\n{service}")
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+        for level in levels:
+            latency = level['latency']
+            print(f"{level['concurrency']:>8} {level['throughput_rps']:>8.2f} {latency.get('p50_ms', 0):>9.1f} "
+                  f"{latency.get('p95_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f}  {level['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', default='static/results/*.png', help='glob of input images')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0],
+                        help='longer side of the corpus images in pixels, 0 for the original size')
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    parser.add_argument('--analyzers', nargs='*', default=list(ANALYZERS), choices=ANALYZERS,
+                        help='in-process benchmarks to run (none to skip)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus per analyzer')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured images before each benchmark')
+    parser.add_argument('--no-visualize', action='store_true', help='skip drawing and encoding the visualization')
+    parser.add_argument('--keep-cache', action='store_true', help='leave the landmark cache as configured')
+    parser.add_argument('--services', nargs='*', default=list(SERVICES), choices=SERVICES,
+                        help='services to load test (none to skip)')
+    parser.add_argument('--url', action='append', help='name=base URL of an already running service')
+    parser.add_argument('--port', type=int, default=5100, help='first port for the started services')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--requests', type=int, default=50, help='requests per concurrency level')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds per HTTP request')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline results JSON to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='relative slowdown (or throughput loss) counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.images, args.sizes)
+    if not corpus:
+        parser.error(f"No images match {args.images}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = {
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'corpus': {'images': args.images, 'sizes': args.sizes, 'count': len(corpus),
+                   'bytes': sum(len(data) for _, data in corpus), 'fingerprint': fingerprint(corpus)},
+        'settings': {key: getattr(args, key) for key in ('repeat', 'warmup', 'no_visualize', 'keep_cache',
+                                                         'concurrency', 'requests')},
+        'environment': {key: value for key, value in sorted(os.environ.items()) if key.startswith('FACIPA_')},
+    }
+    print(f"{len(corpus)} corpus images, {report['corpus']['bytes'] / 1e6:.1f} MB, "
+          f"fingerprint {report['corpus']['fingerprint']}")
+
+    if args.analyzers:
+        report['analyzers'] = bench_analyzers(corpus, args.analyzers, args)
+    if args.services:
+        report['http'] = bench_http(corpus, args)
+    print_report(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
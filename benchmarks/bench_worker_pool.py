@@ -0,0 +1,67 @@
+"""Throughput of the analysis worker pool for an increasing number of workers
+
+Run from the repository root:
+
+    python benchmarks/bench_worker_pool.py --workers 1 2 4 --requests 200
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facial_landmarks import EnhancedFacialParalysisAnalyzer
+from worker_pool import AnalysisWorkerPool
+
+
+def load_images(pattern):
+    images = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def run(workers, images, requests, predictor_path):
+    pool = AnalysisWorkerPool(partial(EnhancedFacialParalysisAnalyzer, predictor_path),
+                              workers=workers, queue_depth=requests)
+    pool.warm_up()
+
+    # Keep every worker busy: one client thread per pool slot
+    payloads = [images[i % len(images)] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+        list(clients.map(lambda image: pool.call('process_image', image, visualize=False), payloads))
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+
+    return {'workers': workers, 'seconds': elapsed, 'images_per_second': requests / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--images', default='static/results/*.png', help='glob of input images')
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error(f"No images match {args.images}")
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'img/s':>8} {'speedup':>8}")
+    for workers in args.workers:
+        result = run(workers, images, args.requests, args.shape_predictor)
+        baseline = baseline or result['images_per_second']
+        print(f"{workers:>8} {result['seconds']:>9.2f} {result['images_per_second']:>8.1f} "
+              f"{result['images_per_second'] / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
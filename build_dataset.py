@@ -0,0 +1,253 @@
+"""Build a landmark feature dataset from an image directory tree or a manifest
+
+    python build_dataset.py --images data/photos --output features.csv --workers 4
+    python build_dataset.py --manifest samples.csv --output features.csv --parquet features_parquet
+
+A manifest is a CSV with an `image_path` column; any other columns (for
+example expert_grade, patient_age or etiology) are copied to the output.
+Images are analyzed on a worker pool in batches of --batch-size, so memory
+stays bounded by one batch. After each batch the rows are appended to the CSV
+(and written as one Parquet part file). A checkpoint records how far the
+run got. Rerunning the same command resumes after the last completed batch.
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from functools import partial
+
+import numpy as np
+
+from facial_landmarks import EnhancedFacialParalysisAnalyzer
+from symmetry_metrics import compute_features
+from worker_pool import AnalysisWorkerPool
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+FEATURE_NAMES = sorted(compute_features(np.zeros((0, 68, 2))))
+RESULT_COLUMNS = ['image_path', 'status', 'face_count', 'box_left', 'box_top', 'box_right', 'box_bottom',
+                  'house_brackmann_grade', 'overall_symmetry', 'eye_symmetry', 'mouth_symmetry', 'brow_symmetry']
+
+
+def iter_directory(root):
+    """Yield image paths under `root` in a stable order, so a checkpoint index stays valid"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield {'image_path': os.path.join(directory, name)}
+
+
+def iter_manifest(path):
+    """Yield manifest rows; relative image paths are resolved against the manifest's directory"""
+    root = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row['image_path'] = os.path.join(root, row['image_path'])
+            yield row
+
+
+def manifest_columns(path):
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    return [column for column in header if column != 'image_path']
+
+
+def batches(rows, size, skip=0):
+    """Group rows into lists of `size`, after skipping the first `skip` rows"""
+    batch = []
+    for index, row in enumerate(rows):
+        if index < skip:
+            continue
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def worker_analyzer(predictor_path, detection_width):
+    """Analyzer factory for the worker pool
+
+    Workers ignore Ctrl-C, so an interrupted run stops in the parent between
+    batches and the pool shuts down cleanly.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return EnhancedFacialParalysisAnalyzer(predictor_path, detection_width=detection_width)
+
+
+def future_result(future):
+    """A worker failure (e.g. a crashing decoder) becomes an error row instead of stopping the run"""
+    try:
+        return future.result()
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def to_rows(samples, results):
+    """Flatten analysis results into output rows, computing all features in one vectorized pass"""
+    rows, landmarks, featured = [], [], []
+    for sample, result in zip(samples, results):
+        row = dict(sample)
+        if 'error' in result:
+            row['status'] = {'No face detected': 'no_face',
+                             'Could not decode image': 'unreadable'}.get(result['error'], 'failed')
+            row['face_count'] = 0
+        else:
+            face = result['faces'][0]
+            row['status'] = 'ok'
+            row['face_count'] = len(result['faces'])
+            row['box_left'], row['box_top'], row['box_right'], row['box_bottom'] = face['box']
+            row['house_brackmann_grade'] = face['house_brackmann_grade']
+            row.update(face['symmetry_scores'])
+            landmarks.append(face['landmarks'])
+            featured.append(row)
+        rows.append(row)
+
+    if landmarks:
+        features = compute_features(np.asarray(landmarks, dtype=np.float64))
+        for index, row in enumerate(featured):
+            for name in FEATURE_NAMES:
+                row[name] = round(float(features[name][index]), 6)
+    return rows
+
+
+class DatasetWriter:
+    def __init__(self, csv_path, columns, parquet_dir=None, checkpoint_path=None):
+        """Append batches to a CSV (and Parquet part files) and checkpoint after each one
+
+        A resumed run truncates the CSV to the size recorded in the
+        checkpoint, so rows from an interrupted batch are never duplicated.
+        """
+        self.csv_path = csv_path
+        self.columns = columns
+        self.parquet_dir = parquet_dir
+        self.checkpoint_path = checkpoint_path or f"{csv_path}.checkpoint.json"
+        self.state = {'next_index': 0, 'rows': 0, 'csv_bytes': 0, 'parquet_parts': 0}
+
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                self.state = json.load(f)
+        elif os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+            raise FileExistsError(f"{csv_path} exists but has no checkpoint; choose a new output file")
+
+        self._file = open(csv_path, 'a+', newline='')
+        self._file.truncate(self.state['csv_bytes'])
+        self._file.seek(self.state['csv_bytes'])
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+        if self.state['csv_bytes'] == 0:
+            self._writer.writeheader()
+            # Checkpoint the header, so a run interrupted during its first batch can resume
+            self._sync()
+            self._save_checkpoint()
+
+        if parquet_dir:
+            os.makedirs(parquet_dir, exist_ok=True)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.state['csv_bytes'] = self._file.tell()
+
+    def _save_checkpoint(self):
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def write_batch(self, rows, next_index):
+        self._writer.writerows(rows)
+        self._sync()
+
+        if self.parquet_dir:
+            table = pyarrow.Table.from_pylist([{column: row.get(column) for column in self.columns} for row in rows])
+            part_path = os.path.join(self.parquet_dir, f"part-{self.state['parquet_parts']:06d}.parquet")
+            pyarrow.parquet.write_table(table, part_path)
+            self.state['parquet_parts'] += 1
+
+        self.state.update(next_index=next_index, rows=self.state['rows'] + len(rows))
+        self._save_checkpoint()
+
+    def close(self):
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--images', help='directory tree of images')
+    source.add_argument('--manifest', help='CSV with an image_path column')
+    parser.add_argument('--output', required=True, help='CSV file to append to')
+    parser.add_argument('--parquet', metavar='DIR', help='also write Parquet part files to this directory')
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    parser.add_argument('--detection-width', type=int, default=640, help='downscaled width for face detection')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='0 analyzes in this process')
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    if args.parquet and pyarrow is None:
+        parser.error("--parquet needs pyarrow (pip install pyarrow)")
+
+    if args.images:
+        samples, extra_columns = iter_directory(args.images), []
+    else:
+        samples, extra_columns = iter_manifest(args.manifest), manifest_columns(args.manifest)
+
+    try:
+        writer = DatasetWriter(args.output, RESULT_COLUMNS + extra_columns + FEATURE_NAMES, args.parquet)
+    except FileExistsError as e:
+        parser.error(str(e))
+
+    pool = None
+    if args.workers > 0:
+        pool = AnalysisWorkerPool(partial(worker_analyzer, args.shape_predictor, args.detection_width),
+                                  workers=args.workers, queue_depth=args.batch_size)
+        pool.warm_up()
+    else:
+        analyzer = EnhancedFacialParalysisAnalyzer(args.shape_predictor, detection_width=args.detection_width)
+
+    next_index = writer.state['next_index']
+    if next_index:
+        print(f"Resuming after {next_index} images ({writer.state['rows']} rows written)", file=sys.stderr)
+
+    start = time.perf_counter()
+    processed = 0
+    try:
+        for batch in batches(samples, args.batch_size, skip=next_index):
+            paths = [sample['image_path'] for sample in batch]
+            if pool is not None:
+                futures = [pool.submit('process_image', path, visualize=False) for path in paths]
+                results = [future_result(future) for future in futures]
+            else:
+                results = [analyzer.process_image(path, visualize=False) for path in paths]
+
+            next_index += len(batch)
+            processed += len(batch)
+            writer.write_batch(to_rows(batch, results), next_index)
+            elapsed = time.perf_counter() - start
+            print(f"{next_index} images, {processed / elapsed:.1f} images/s", file=sys.stderr)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume after {writer.state['next_index']} images",
+              file=sys.stderr)
+        sys.exit(130)
+    finally:
+        writer.close()
+        if pool is not None:
+            # Work queued for an interrupted batch is redone on resume
+            pool.shutdown(cancel_futures=True)
+
+    print(json.dumps({'images': next_index, 'rows': writer.state['rows'], 'output': args.output,
+                      'parquet_parts': writer.state['parquet_parts']}))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,13 @@ import csv
 import os
 from datetime import datetime
 
+from symmetry_metrics import compute_features
+
 class MedicalDataCollector:
     def __init__(self, data_file='medical_facial_data.csv'):
         self.data_file = data_file
+        self._file = None
+        self._writer = None
         self.initialize_dataset()
     
     def initialize_dataset(self):
@@ -19,23 +23,58 @@ class MedicalDataCollector:
                     'etiology', 'treatment_status', 'notes'
                 ])
     
+    def extract_features(self, landmarks):
+        """Dataset features for one face's 68 (x, y) landmarks
+
+        eye_closure_ratio is the smaller eye opening over the larger one
+        (1 for equally open eyes); the other two are pixel differences.
+        """
+        features = compute_features(landmarks)
+        return {
+            'eye_closure_ratio': round(float(features['eye_closure_symmetry'][0]), 4),
+            'mouth_deviation_score': round(float(features['mouth_corner_height_diff'][0]), 4),
+            'brow_elevation_asymmetry': round(float(features['brow_outer_height_diff'][0]), 4)
+        }
+    
     def add_medical_sample(self, image_path, landmarks, expert_grade, patient_info=None):
-        """Add a new sample to the medical dataset"""
+        """Add a new sample to the medical dataset
+
+        The CSV stays open between samples; call flush() or close() (or use
+        the collector as a context manager) to make sure rows reach the disk.
+        For bulk imports use build_dataset.py instead.
+        """
         features = self.extract_features(landmarks)
         
-        with open(self.data_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.now().isoformat(),
-                image_path,
-                expert_grade,
-                expert_grade,  # expert_rating same as grade for now
-                features['eye_closure_ratio'],
-                features['mouth_deviation_score'],
-                features['brow_elevation_asymmetry'],
-                patient_info.get('age', '') if patient_info else '',
-                patient_info.get('duration_days', '') if patient_info else '',
-                patient_info.get('etiology', '') if patient_info else '',
-                patient_info.get('treatment', '') if patient_info else '',
-                patient_info.get('notes', '') if patient_info else ''
-            ])
\ No newline at end of file
+        if self._writer is None:
+            self._file = open(self.data_file, 'a', newline='')
+            self._writer = csv.writer(self._file)
+        self._writer.writerow([
+            datetime.now().isoformat(),
+            image_path,
+            expert_grade,
+            expert_grade,  # expert_rating same as grade for now
+            features['eye_closure_ratio'],
+            features['mouth_deviation_score'],
+            features['brow_elevation_asymmetry'],
+            patient_info.get('age', '') if patient_info else '',
+            patient_info.get('duration_days', '') if patient_info else '',
+            patient_info.get('etiology', '') if patient_info else '',
+            patient_info.get('treatment', '') if patient_info else '',
+            patient_info.get('notes', '') if patient_info else ''
+        ])
+    
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
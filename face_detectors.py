@@ -0,0 +1,190 @@
+import os
+import threading
+from functools import partial
+
+import cv2
+
+from model_registry import get_frontal_face_detector, registry
+
+try:
+    import dlib
+except ImportError:
+    dlib = None
+
+
+def to_dlib_rectangle(box):
+    """Convert a (left, top, right, bottom) box to a dlib rectangle"""
+    left, top, right, bottom = (int(round(value)) for value in box)
+    return dlib.rectangle(left, top, right, bottom)
+
+
+class FaceDetector:
+    """Base class for face detector backends
+
+    detect() takes a BGR or grayscale image and returns a list of
+    (left, top, right, bottom) boxes, largest confidence first where the
+    backend provides one. With `detection_width` set, detection runs on a
+    copy downscaled to that width and boxes are mapped back to the original.
+    Models are loaded on first use through the shared model registry and are
+    not pickled, so configured detectors can be handed to worker processes.
+    """
+    name = None
+
+    def __init__(self, detection_width=None):
+        self.detection_width = detection_width
+        self._model = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_model'] = None
+        return state
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.load_model()
+        return self._model
+
+    def load_model(self):
+        raise NotImplementedError
+
+    def _detect(self, image):
+        raise NotImplementedError
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        if not self.detection_width or width <= self.detection_width:
+            return self._detect(image)
+
+        scale = width / self.detection_width
+        small = cv2.resize(image, (self.detection_width, max(1, int(round(height / scale)))),
+                           interpolation=cv2.INTER_AREA)
+        return [tuple(value * scale for value in box) for box in self._detect(small)]
+
+    @staticmethod
+    def _gray(image):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class DlibHOGDetector(FaceDetector):
+    name = 'hog'
+    # The (registry-shared) dlib detector keeps scratch buffers between calls; concurrent calls crash
+    _detect_lock = threading.Lock()
+
+    def __init__(self, detection_width=None, upsample=0):
+        super().__init__(detection_width)
+        self.upsample = upsample
+
+    def load_model(self):
+        return get_frontal_face_detector()
+
+    def _detect(self, image):
+        gray = self._gray(image)
+        with self._detect_lock:
+            rects = self.model(gray, self.upsample)
+        return [(rect.left(), rect.top(), rect.right(), rect.bottom()) for rect in rects]
+
+
+class OpenCVHaarDetector(FaceDetector):
+    name = 'haar'
+    # detectMultiScale keeps per-scale data on the shared classifier, so one call at a time
+    _detect_lock = threading.Lock()
+
+    def __init__(self, detection_width=None, cascade_path=None, scale_factor=1.1, min_neighbors=4):
+        super().__init__(detection_width)
+        self.cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def load_model(self):
+        return registry.get(f"haar:{self.cascade_path}", partial(cv2.CascadeClassifier, self.cascade_path))
+
+    def _detect(self, image):
+        gray = self._gray(image)
+        with self._detect_lock:
+            faces = self.model.detectMultiScale(gray, self.scale_factor, self.min_neighbors)
+        return [(x, y, x + w, y + h) for (x, y, w, h) in faces]
+
+
+class OpenCVDNNDetector(FaceDetector):
+    """ResNet-10 SSD face detector (deploy.prototxt + res10_300x300_ssd_iter_140000.caffemodel)"""
+    name = 'dnn'
+    # setInput/forward share state on the (registry-shared) network, so one call at a time
+    _forward_lock = threading.Lock()
+
+    def __init__(self, detection_width=None, prototxt_path='deploy.prototxt',
+                 model_path='res10_300x300_ssd_iter_140000.caffemodel', confidence=0.5):
+        super().__init__(detection_width)
+        self.prototxt_path = prototxt_path
+        self.model_path = model_path
+        self.confidence = confidence
+
+    def load_model(self):
+        for path in (self.prototxt_path, self.model_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face detector file not found: {path}")
+        return registry.get(f"dnn:{self.model_path}",
+                            partial(cv2.dnn.readNetFromCaffe, self.prototxt_path, self.model_path))
+
+    def _detect(self, image):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        with self._forward_lock:
+            self.model.setInput(blob)
+            detections = self.model.forward()[0, 0]
+
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            left, top, right, bottom = detection[3:7] * [width, height, width, height]
+            boxes.append((max(0, left), max(0, top), min(width - 1, right), min(height - 1, bottom)))
+        return boxes
+
+
+class DlibCNNDetector(FaceDetector):
+    """dlib MMOD CNN detector (mmod_human_face_detector.dat), run on the CPU"""
+    name = 'cnn'
+    # The network's layers hold their outputs between calls, so one call at a time
+    _detect_lock = threading.Lock()
+
+    def __init__(self, detection_width=None, model_path='mmod_human_face_detector.dat', upsample=0):
+        super().__init__(detection_width)
+        self.model_path = model_path
+        self.upsample = upsample
+
+    def load_model(self):
+        return registry.get(f"dlib_cnn:{self.model_path}",
+                            partial(dlib.cnn_face_detection_model_v1, self.model_path))
+
+    def _detect(self, image):
+        gray = self._gray(image)
+        with self._detect_lock:
+            detections = self.model(gray, self.upsample)
+        detections = sorted(detections, key=lambda d: -d.confidence)
+        return [(d.rect.left(), d.rect.top(), d.rect.right(), d.rect.bottom()) for d in detections]
+
+
+DETECTORS = {cls.name: cls for cls in (DlibHOGDetector, OpenCVHaarDetector, OpenCVDNNDetector, DlibCNNDetector)}
+
+
+def create_detector(name='hog', **options):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown face detector '{name}', choose from {', '.join(DETECTORS)}")
+    return DETECTORS[name](**options)
+
+
+def detector_from_env():
+    """Build the detector selected by FACIPA_DETECTOR (hog, haar, dnn or cnn)
+
+    FACIPA_DETECTION_WIDTH enables downscaled detection; FACIPA_DNN_PROTOTXT,
+    FACIPA_DNN_MODEL and FACIPA_CNN_MODEL point at the model files.
+    """
+    name = os.environ.get('FACIPA_DETECTOR', 'hog')
+    options = {'detection_width': int(os.environ.get('FACIPA_DETECTION_WIDTH', '0')) or None}
+    if name == 'dnn':
+        options['prototxt_path'] = os.environ.get('FACIPA_DNN_PROTOTXT', 'deploy.prototxt')
+        options['model_path'] = os.environ.get('FACIPA_DNN_MODEL', 'res10_300x300_ssd_iter_140000.caffemodel')
+    elif name == 'cnn':
+        options['model_path'] = os.environ.get('FACIPA_CNN_MODEL', 'mmod_human_face_detector.dat')
+    return create_detector(name, **options)
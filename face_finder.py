@@ -0,0 +1,188 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from face_detectors import to_dlib_rectangle
+from image_io import clip_boxes, crop_padded
+from landmark_cache import model_version
+from metrics import record_stage
+from model_registry import get_shape_predictor
+
+
+def parse_max_faces(value):
+    """Map the `faces` request option (largest, all or a count) to max_faces"""
+    if value in (None, '', 'largest'):
+        return 1
+    if value == 'all':
+        return None
+    if not str(value).isdigit() or int(value) < 1:
+        raise ValueError("faces must be 'largest', 'all' or a positive count")
+    return int(value)
+
+
+def parse_face_boxes(values):
+    """Map `face_box` options ("left,top,right,bottom", repeatable) or JSON `face_boxes` to boxes, or None"""
+    if not isinstance(values, (list, tuple)):
+        raise ValueError("face_boxes must be a list of [left, top, right, bottom] boxes")
+    boxes = []
+    for value in values:
+        try:
+            box = [int(round(float(part))) for part in (value.split(',') if isinstance(value, str) else value)]
+        except (TypeError, ValueError):
+            box = []
+        if len(box) != 4 or box[2] <= box[0] or box[3] <= box[1]:
+            raise ValueError("face_box must be 'left,top,right,bottom' with right > left and bottom > top")
+        boxes.append(box)
+    return boxes or None
+
+
+def prediction_threads_from_env():
+    """Threads predicting the faces of one group photo, from FACIPA_PREDICTION_THREADS (4 by default)"""
+    return max(1, int(os.environ.get('FACIPA_PREDICTION_THREADS', '4')))
+
+
+def _box_area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+class FaceFinder:
+    """Detects faces and predicts their 68 landmarks for the analyzers
+
+    `detector` is a face_detectors backend. With `roi_padding` set, landmarks
+    are predicted on a grayscale crop of each face box grown by that fraction
+    (0.25 gives the same points as the full frame); None converts and
+    predicts on the whole frame. `cache` is an optional LandmarkCache used to
+    skip detection for images seen before. Faces in group photos are
+    predicted on up to `prediction_threads` threads (FACIPA_PREDICTION_THREADS
+    by default).
+
+    `fallback_detector` and `fallback_landmarks(box)` take over when the
+    detector fails or finds no face; without a `detector` (dlib missing)
+    they are used for every image and for caller-supplied boxes.
+    """
+
+    def __init__(self, predictor_path, detector=None, cache=None, prediction_threads=None, roi_padding=0.25,
+                 fallback_detector=None, fallback_landmarks=None):
+        if detector is None and fallback_detector is None:
+            raise ValueError("FaceFinder needs a detector or a fallback_detector")
+        self.predictor_path = predictor_path
+        self.detector = detector
+        self.cache = cache
+        self.prediction_threads = prediction_threads or prediction_threads_from_env()
+        self.roi_padding = roi_padding
+        self.fallback_detector = fallback_detector
+        self.fallback_landmarks = fallback_landmarks
+        self._executor = None
+        source = detector or fallback_detector
+        self.model_version = model_version(predictor_path, source.name,
+                                           detector.detection_width if detector is not None else None)
+
+    @property
+    def predictor(self):
+        """68-point shape predictor, loaded once per process on first use"""
+        return get_shape_predictor(self.predictor_path)
+
+    def predict(self, gray, box):
+        """68 landmark points for one (left, top, right, bottom) box on a grayscale image"""
+        landmarks = self.predictor(gray, to_dlib_rectangle(box))
+        return [(landmarks.part(n).x, landmarks.part(n).y) for n in range(68)]
+
+    def _predict_roi(self, image, box):
+        """68 landmark points predicted on the padded grayscale crop around one face"""
+        roi, (x0, y0) = crop_padded(image, box, self.roi_padding)
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        left, top, right, bottom = box
+        points = self.predict(gray, (left - x0, top - y0, right - x0, bottom - y0))
+        return [(x + x0, y + y0) for x, y in points]
+
+    def _grayscale(self, image, timings, stage_start):
+        """Convert the whole frame once when predicting on full frames; ROI mode converts per crop"""
+        if self.roi_padding is not None or self.detector is None or image.ndim == 2:
+            return image, stage_start
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image, record_stage(timings, 'grayscale', stage_start)
+
+    def _predict_boxes(self, image, boxes, timings, stage_start):
+        """Predict every box on `image` (grayscale, or BGR in ROI mode) and return [(box, points)]"""
+        if self.detector is None:
+            faces = [(box, self.fallback_landmarks(box)) for box in boxes]
+            record_stage(timings, 'predict', stage_start)
+            return faces
+
+        predict = self.predict if self.roi_padding is None else self._predict_roi
+        # Faces are independent, so group photos predict them concurrently
+        if len(boxes) > 1:
+            landmarks = list(self._prediction_pool().map(lambda box: predict(image, box), boxes))
+        else:
+            landmarks = [predict(image, box) for box in boxes]
+        record_stage(timings, 'predict', stage_start)
+        return list(zip(boxes, landmarks))
+
+    def _prediction_pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.prediction_threads)
+        return self._executor
+
+    def _detect(self, image, timings, stage_start):
+        """Detect and predict with the configured detector, largest face first"""
+        # The detector converts only its (possibly downscaled) copy unless the frame is already grayscale
+        image, stage_start = self._grayscale(image, timings, stage_start)
+        boxes = sorted((tuple(int(round(value)) for value in box) for box in self.detector.detect(image)),
+                       key=_box_area, reverse=True)
+        stage_start = record_stage(timings, 'detect', stage_start)
+        return self._predict_boxes(image, boxes, timings, stage_start)
+
+    def _detect_fallback(self, image, timings, stage_start):
+        boxes = sorted((tuple(int(value) for value in box) for box in self.fallback_detector.detect(image)),
+                       key=_box_area, reverse=True)
+        faces = [(box, self.fallback_landmarks(box)) for box in boxes]
+        record_stage(timings, 'fallback_detect', stage_start)
+        return faces
+
+    def find_faces(self, image, max_faces=None, timings=None, face_boxes=None):
+        """Return [(box, landmarks_points), ...] for the faces in a BGR image, largest first
+
+        Boxes are (left, top, right, bottom). `max_faces` keeps only the k
+        largest faces (None keeps all). Every detected face is predicted and
+        cached, so later requests with a different `max_faces` still hit the
+        landmark cache. Stage seconds are added to `timings` when given.
+
+        `face_boxes` skips detection and the cache and predicts landmarks for
+        the given boxes instead, e.g. from a detector running in the browser.
+        """
+        stage_start = time.perf_counter()
+        if face_boxes is not None:
+            boxes = clip_boxes(face_boxes, image.shape)
+            image, stage_start = self._grayscale(image, timings, stage_start)
+            return self._predict_boxes(image, boxes, timings, stage_start)[:max_faces]
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(image, self.model_version)
+            cached = self.cache.get(key)
+            stage_start = record_stage(timings, 'cache', stage_start)
+            if cached is not None:
+                boxes, landmarks = cached
+                faces = [(tuple(box), [tuple(point) for point in points])
+                         for box, points in zip(boxes.tolist(), landmarks.tolist())]
+                return faces[:max_faces]
+
+        faces = []
+        if self.detector is not None and self.fallback_detector is None:
+            faces = self._detect(image, timings, stage_start)
+        elif self.detector is not None:
+            try:
+                faces = self._detect(image, timings, stage_start)
+            except Exception as e:
+                print(f"Face detection failed: {e}")
+        if not faces and self.fallback_detector is not None:
+            faces = self._detect_fallback(image, timings, time.perf_counter())
+
+        if key is not None:
+            stage_start = time.perf_counter()
+            self.cache.put(key, [box for box, _ in faces], [points for _, points in faces])
+            record_stage(timings, 'cache', stage_start)
+
+        return faces[:max_faces]
@@ -2,50 +2,70 @@ import cv2
 import dlib
 import numpy as np
 import json
-from scipy.spatial import distance
+import time
+from image_io import decode_image, encode_preview, fit_width
+from symmetry_metrics import compute_features
+from face_detectors import DlibHOGDetector, to_dlib_rectangle
+from face_finder import FaceFinder
+from model_registry import get_shape_predictor
+from metrics import image_info, record_stage
+
 
 class EnhancedFacialParalysisAnalyzer:
-    def __init__(self, predictor_path):
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor(predictor_path)
-        
-    def calculate_symmetry_score(self, landmarks):
-        """Calculate symmetry score between left and right facial features"""
-        # Define left and right facial points
-        left_eye_points = list(range(36, 42))
-        right_eye_points = list(range(42, 48))
-        left_brow_points = list(range(17, 22))
-        right_brow_points = list(range(22, 27))
-        left_mouth_points = [48, 49, 50, 58, 59, 60]
-        right_mouth_points = [52, 53, 54, 55, 64, 65]
-        
-        symmetry_scores = {}
-        
-        # Eye symmetry
-        left_eye_width = distance.euclidean(landmarks[36], landmarks[39])
-        right_eye_width = distance.euclidean(landmarks[42], landmarks[45])
-        eye_symmetry = 1 - abs(left_eye_width - right_eye_width) / max(left_eye_width, right_eye_width)
-        
-        # Mouth symmetry
-        mouth_left = landmarks[48]
-        mouth_right = landmarks[54]
-        mouth_center = landmarks[51]
-        left_dist = distance.euclidean(mouth_left, mouth_center)
-        right_dist = distance.euclidean(mouth_right, mouth_center)
-        mouth_symmetry = 1 - abs(left_dist - right_dist) / max(left_dist, right_dist)
-        
-        # Brow symmetry
-        left_brow_avg = np.mean([landmarks[i] for i in left_brow_points], axis=0)
-        right_brow_avg = np.mean([landmarks[i] for i in right_brow_points], axis=0)
-        brow_symmetry = 1 - distance.euclidean(left_brow_avg, right_brow_avg) / 100
+    def __init__(self, predictor_path, detection_width=None, cache=None, detector=None, prediction_threads=None,
+                 preview=None, quality=None, roi_padding=0.25):
+        """`detector` is a face_detectors backend, dlib HOG by default. For the
+        default detector, `detection_width` enables detecting on a copy
+        downscaled to that width; landmarks are still predicted on the original
+        resolution. `cache` is an optional LandmarkCache used to skip dlib for
+        images seen before. Faces in group photos are predicted on up to
+        `prediction_threads` threads (FACIPA_PREDICTION_THREADS by default).
+        `preview` holds encode_preview() options for the returned
+        visualization (full-size PNG by default). `quality` is an optional
+        image_quality.QualityGate checked before detection and on the largest
+        detected face.
+        With `roi_padding` set, landmarks are predicted on a grayscale crop of
+        each face box grown by that fraction (0.25 gives the same points as
+        the full frame); None converts and predicts on the whole frame."""
+        self.face_detector = detector or DlibHOGDetector(detection_width=detection_width)
+        self.predictor_path = predictor_path
+        self.face_finder = FaceFinder(predictor_path, self.face_detector, cache=cache,
+                                      prediction_threads=prediction_threads, roi_padding=roi_padding)
+        self.preview = preview or {'image_format': 'png'}
+        self.quality = quality
+        self.model_version = self.face_finder.model_version
+    
+    @property
+    def predictor(self):
+        """68-point shape predictor, loaded once per process on first use"""
+        return get_shape_predictor(self.predictor_path)
+    
+    def detect_faces(self, gray):
+        """Run the configured face detector and return dlib rectangles"""
+        faces = dlib.rectangles()
+        for box in self.face_detector.detect(gray):
+            faces.append(to_dlib_rectangle(box))
+        return faces
+        
+    def calculate_symmetry_score(self, landmarks, features=None, face_index=0):
+        """Calculate symmetry score between left and right facial features
+
+        `features` may hold compute_features() output for several faces at
+        once; `face_index` selects the face to report.
+        """
+        if features is None:
+            features = compute_features(landmarks)
+        eye_symmetry = features['eye_width_symmetry'][face_index]
+        mouth_symmetry = features['mouth_corner_symmetry'][face_index]
+        brow_symmetry = features['brow_offset_symmetry'][face_index]
         
         overall_symmetry = (eye_symmetry + mouth_symmetry + brow_symmetry) / 3
         
         symmetry_scores = {
-            'eye_symmetry': round(eye_symmetry * 100, 2),
-            'mouth_symmetry': round(mouth_symmetry * 100, 2),
-            'brow_symmetry': round(brow_symmetry * 100, 2),
-            'overall_symmetry': round(overall_symmetry * 100, 2)
+            'eye_symmetry': round(float(eye_symmetry) * 100, 2),
+            'mouth_symmetry': round(float(mouth_symmetry) * 100, 2),
+            'brow_symmetry': round(float(brow_symmetry) * 100, 2),
+            'overall_symmetry': round(float(overall_symmetry) * 100, 2)
         }
         
         return symmetry_scores
@@ -67,75 +87,168 @@ class EnhancedFacialParalysisAnalyzer:
         else:
             return 6, "Total Paralysis"
     
-    def analyze_facial_movement(self, image, landmarks):
+    def analyze_facial_movement(self, image, landmarks, features=None, face_index=0):
         """Analyze facial movement and paralysis indicators"""
-        # Calculate facial angles and distances
-        results = {}
-        
-        # Mouth angle calculation
-        mouth_left = landmarks[48]
-        mouth_right = landmarks[54]
-        mouth_center_top = landmarks[51]
-        mouth_center_bottom = landmarks[57]
-        
-        # Calculate mouth asymmetry
-        horizontal_asymmetry = abs(mouth_left[0] - mouth_center_top[0]) - abs(mouth_right[0] - mouth_center_top[0])
-        vertical_asymmetry = abs(mouth_center_top[1] - mouth_center_bottom[1])
-        
-        # Eye closure analysis
-        left_eye_height = distance.euclidean(landmarks[37], landmarks[41])
-        right_eye_height = distance.euclidean(landmarks[43], landmarks[47])
-        eye_closure_asymmetry = abs(left_eye_height - right_eye_height)
-        
-        results.update({
-            'mouth_horizontal_asymmetry': round(abs(horizontal_asymmetry), 2),
-            'mouth_vertical_asymmetry': round(vertical_asymmetry, 2),
-            'eye_closure_asymmetry': round(eye_closure_asymmetry, 2)
-        })
+        if features is None:
+            features = compute_features(landmarks)
         
-        return results
+        return {
+            'mouth_horizontal_asymmetry': round(float(features['mouth_horizontal_asymmetry'][face_index]), 2),
+            'mouth_vertical_asymmetry': round(float(features['mouth_vertical_asymmetry'][face_index]), 2),
+            'eye_closure_asymmetry': round(float(features['eye_closure_asymmetry'][face_index]), 2),
+            'brow_height_asymmetry': round(float(features['brow_outer_height_diff'][face_index]), 2)
+        }
     
-    def process_image(self, image_path):
-        """Main processing function"""
-        image = cv2.imread(image_path)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.detector(gray)
+    def find_faces(self, image, timings=None, max_faces=None, face_boxes=None):
+        """Return [(box, landmarks_points), ...] for the faces found by FaceFinder.find_faces(), largest first"""
+        return self.face_finder.find_faces(image, max_faces=max_faces, timings=timings, face_boxes=face_boxes)
+    
+    def find_landmarks(self, image, timings=None):
+        """Return the largest face's box and its 68 points, or (None, None)"""
+        faces = self.find_faces(image, timings, max_faces=1)
+        return faces[0] if faces else (None, None)
+    
+    def process_image(self, image, output_path=None, visualize=True, timings=None, max_faces=1, face_boxes=None):
+        """Main processing function
+
+        `image` may be a file path, raw encoded bytes or a decoded BGR ndarray.
+        The visualization is only rendered when `visualize` is set or an
+        `output_path` is given. It is returned encoded as configured by
+        `preview`, and is only written to disk at full size when
+        `output_path` is given. `max_faces` analyzes the k largest faces (None
+        for all); each gets an entry in 'faces'. `face_boxes` are
+        caller-supplied (left, top, right, bottom) boxes that replace face
+        detection. Images failing a rejecting quality gate return an error
+        with the gate's 'quality' report.
+
+        Every result carries a 'trace' with the seconds spent in each stage
+        and the image size. When a `timings` dict is passed, the stage
+        seconds are also added to it.
+        """
+        stages = {}
+        stage_start = time.perf_counter()
+        source, image = image, decode_image(image)
+        stage_start = record_stage(stages, 'decode', stage_start)
+        trace = {'stages': stages, 'image': image_info(source, image)}
+        if image is None:
+            return self._finish({"error": "Could not decode image"}, trace, timings)
+
+        quality = None
+        if self.quality is not None:
+            quality = self.quality.assess_faces(image, face_boxes)
+            stage_start = record_stage(stages, 'quality', stage_start)
+            if self.quality.rejected(quality):
+                return self._finish({"error": "Image quality too low", "quality": quality}, trace, timings)
+
+        faces = self.find_faces(image, stages, max_faces=max_faces, face_boxes=face_boxes)
+        stage_start = time.perf_counter()
         
-        if len(faces) == 0:
-            return {"error": "No face detected"}
+        if quality is not None and faces and face_boxes is None:
+            # Exposure and size of the largest detected face, not of its backdrop
+            quality = self.quality.assess(image, faces[0][0])
+            stage_start = record_stage(stages, 'quality', stage_start)
+            if self.quality.rejected(quality):
+                return self._finish({"error": "Image quality too low", "quality": quality}, trace, timings)
         
-        face = faces[0]
-        landmarks = self.predictor(gray, face)
+        if not faces:
+            # A flagged quality report often explains why no face was found
+            error = {"error": "No face detected"}
+            if quality is not None:
+                error['quality'] = quality
+            return self._finish(error, trace, timings)
         
-        # Convert landmarks to list of points
-        landmarks_points = []
-        for n in range(0, 68):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            landmarks_points.append((x, y))
+        # Calculate scores for every face in one vectorized pass
+        features = compute_features([points for _, points in faces])
+        face_results = []
+        for index, (box, landmarks_points) in enumerate(faces):
+            symmetry_scores = self.calculate_symmetry_score(landmarks_points, features, index)
+            hb_grade, hb_classification = self.calculate_house_brackmann_score(symmetry_scores, landmarks_points)
+            face_results.append({
+                'box': list(box),
+                'landmarks': [list(point) for point in landmarks_points],
+                'symmetry_scores': symmetry_scores,
+                'house_brackmann_grade': hb_grade,
+                'house_brackmann_classification': hb_classification,
+                'movement_analysis': self.analyze_facial_movement(image, landmarks_points, features, index)
+            })
+        stage_start = record_stage(stages, 'score', stage_start)
         
-        # Calculate scores
-        symmetry_scores = self.calculate_symmetry_score(landmarks_points)
-        hb_grade, hb_classification = self.calculate_house_brackmann_score(symmetry_scores, landmarks_points)
-        movement_analysis = self.analyze_facial_movement(image, landmarks_points)
+        # Top-level fields describe the largest face
+        primary = face_results[0]
+        results = {
+            'symmetry_scores': primary['symmetry_scores'],
+            'house_brackmann_grade': primary['house_brackmann_grade'],
+            'house_brackmann_classification': primary['house_brackmann_classification'],
+            'movement_analysis': primary['movement_analysis'],
+            'faces': face_results,
+            'model_version': self.model_version
+        }
+        if quality is not None:
+            results['quality'] = quality
         
-        # Create visualization
-        visualization = self.create_visualization(image.copy(), landmarks_points, symmetry_scores, hb_grade)
+        if not visualize and not output_path:
+            return self._finish(results, trace, timings)
         
-        return {
-            'symmetry_scores': symmetry_scores,
-            'house_brackmann_grade': hb_grade,
-            'house_brackmann_classification': hb_classification,
-            'movement_analysis': movement_analysis,
-            'visualization_path': visualization
-        }
+        # Without a full-size file to write, draw on a copy already scaled down to the preview width
+        canvas, scale = fit_width(image, None if output_path else self.preview.get('max_width'))
+        canvas = image.copy() if canvas is image else canvas
+        drawn_faces = [dict(face, box=[int(round(value * scale)) for value in face['box']],
+                            landmarks=[(int(round(x * scale)), int(round(y * scale))) for x, y in face['landmarks']])
+                       for face in face_results]
+        visualization = self.create_visualization(canvas, drawn_faces[0]['landmarks'], primary['symmetry_scores'],
+                                                  primary['house_brackmann_grade'], drawn_faces)
+        stage_start = record_stage(stages, 'draw', stage_start)
+        if visualize:
+            results['visualization'], results['visualization_ext'], results['visualization_mime'] = \
+                encode_preview(visualization, **self.preview)
+            stage_start = record_stage(stages, 'encode', stage_start)
+        
+        # Only touch the filesystem when the caller wants to keep the result
+        if output_path:
+            cv2.imwrite(output_path, visualization)
+            results['visualization_path'] = output_path
+            record_stage(stages, 'write', stage_start)
+        
+        return self._finish(results, trace, timings)
+    
+    @staticmethod
+    def _finish(results, trace, timings):
+        """Attach the per-image trace and add its stage durations to the caller's `timings`"""
+        if timings is not None:
+            for stage, seconds in trace['stages'].items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        results['trace'] = trace
+        return results
+    
+    def process_batch(self, images, visualize=False, max_faces=1):
+        """Process many images with the already loaded detector and predictor
+
+        Results are returned in input order together with the total and
+        per-image seconds spent in each stage.
+        """
+        batch_start = time.perf_counter()
+        results = [self.process_image(image, visualize=visualize, max_faces=max_faces) for image in images]
+        return batch_report(results, time.perf_counter() - batch_start)
     
-    def create_visualization(self, image, landmarks, symmetry_scores, hb_grade):
-        """Create comprehensive visualization with scores and analysis"""
+    def create_visualization(self, image, landmarks, symmetry_scores, hb_grade, faces=None):
+        """Create comprehensive visualization with scores and analysis
+
+        When per-face results are given, every face gets its box, landmarks
+        and grade drawn; the text panel describes the largest face.
+        """
         # Draw landmarks
         for (x, y) in landmarks:
             cv2.circle(image, (x, y), 2, (0, 255, 0), -1)
         
+        for number, face in enumerate(faces or [], start=1):
+            left, top, right, bottom = face['box']
+            cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), 1)
+            cv2.putText(image, f"Face #{number}: Grade {face['house_brackmann_grade']}", (left, max(15, top - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+            if number > 1:
+                for (x, y) in face['landmarks']:
+                    cv2.circle(image, (x, y), 2, (0, 255, 0), -1)
+        
         # Draw symmetry lines
         height, width = image.shape[:2]
         cv2.line(image, (width//2, 0), (width//2, height), (255, 0, 0), 1)
@@ -152,8 +265,22 @@ class EnhancedFacialParalysisAnalyzer:
         cv2.putText(image, f"Mouth Symmetry: {symmetry_scores['mouth_symmetry']}%", 
                    (10, y_offset + 90), font, 0.5, (255, 255, 255), 1)
         
-        # Save visualization
-        output_path = "paralysis_analysis_visualization.png"
-        cv2.imwrite(output_path, image)
-        
-        return output_path
\ No newline at end of file
+        return image
+
+
+def batch_report(results, total_seconds):
+    """process_batch() response for per-image results (each with its 'trace') that took `total_seconds`"""
+    timings = {}
+    for image_results in results:
+        for stage, seconds in image_results['trace']['stages'].items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    count = len(results)
+    return {
+        'results': results,
+        'count': count,
+        'timings': {
+            'total_seconds': round(total_seconds, 4),
+            'stages_seconds': {stage: round(seconds, 4) for stage, seconds in timings.items()},
+            'per_image_seconds': {stage: round(seconds / count, 4) for stage, seconds in timings.items()} if count else {}
+        }
+    }
@@ -1,38 +1,221 @@
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
+from itertools import chain
+
+import numpy as np
+
+from landmark_store import LandmarkStore
 
 class ResultsManager:
-    def __init__(self, storage_file="analysis_results.json"):
+    def __init__(self, storage_file="analysis_results.db", legacy_file="analysis_results.json",
+                 landmark_dir=None, landmark_dtype='int16'):
+        """Analysis history stored in SQLite, indexed by grade, time and patient
+
+        Results from the old whole-file JSON store are imported once when the
+        database is still empty. Face landmarks are kept out of the JSON rows
+        and appended to a LandmarkStore (by default next to the database), so
+        history can be re-scored without running dlib again.
+        """
         self.storage_file = storage_file
-        self.load_results()
-    
-    def load_results(self):
-        if os.path.exists(self.storage_file):
-            with open(self.storage_file, 'r') as f:
-                self.results = json.load(f)
-        else:
-            self.results = []
-    
-    def save_result(self, image_path, analysis_results):
-        result_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'image_path': image_path,
-            'results': analysis_results
+        self.landmarks = LandmarkStore(landmark_dir or f"{os.path.splitext(storage_file)[0]}_landmarks",
+                                       dtype=landmark_dtype)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(storage_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.create_tables()
+        self.import_legacy_results(legacy_file)
+
+    def create_tables(self):
+        with self._lock, self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    image_path TEXT,
+                    patient_id TEXT,
+                    grade INTEGER,
+                    results TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_results_grade ON results (grade, id);
+                CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_results_patient ON results (patient_id, id);
+                CREATE TABLE IF NOT EXISTS rescored (
+                    result_id INTEGER NOT NULL,
+                    face INTEGER NOT NULL,
+                    config_version TEXT NOT NULL,
+                    overall_symmetry REAL,
+                    grade INTEGER,
+                    PRIMARY KEY (config_version, result_id, face)
+                );
+            ''')
+
+    def import_legacy_results(self, legacy_file):
+        if not legacy_file or not os.path.exists(legacy_file) or self.count() > 0:
+            return
+
+        with open(legacy_file, 'r') as f:
+            entries = json.load(f)
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT INTO results (timestamp, image_path, patient_id, grade, results) VALUES (?, ?, ?, ?, ?)',
+                [self._row_values(entry['timestamp'], entry.get('image_path'), entry.get('patient_id'), entry['results'])
+                 for entry in entries])
+
+    @staticmethod
+    def _grade(analysis_results):
+        if 'house_brackmann_grade' in analysis_results:
+            return analysis_results['house_brackmann_grade']
+        return analysis_results.get('house_brackmann', {}).get('grade')
+
+    def _row_values(self, timestamp, image_path, patient_id, analysis_results):
+        return (timestamp, image_path, patient_id, self._grade(analysis_results), json.dumps(analysis_results))
+
+    @staticmethod
+    def _entry(row):
+        return {
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'image_path': row['image_path'],
+            'patient_id': row['patient_id'],
+            'results': json.loads(row['results'])
         }
-        
-        self.results.append(result_entry)
-        
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.results, f, indent=2)
-    
+
+    @staticmethod
+    def _split_landmarks(analysis_results):
+        """Move per-face landmarks out of the results; returns (results, landmarks or None)"""
+        faces = analysis_results.get('faces')
+        if not faces or any('landmarks' not in face for face in faces):
+            return analysis_results, None
+        stripped = dict(analysis_results)
+        stripped['faces'] = [{key: value for key, value in face.items() if key != 'landmarks'} for face in faces]
+        return stripped, [face['landmarks'] for face in faces]
+
+    def save_result(self, image_path, analysis_results, patient_id=None, landmarks=None):
+        """Append one analysis and return its id
+
+        Landmarks come from `landmarks` ((F, 68, 2), one set per face) or from
+        the 'landmarks' of each entry in analysis_results['faces'].
+        """
+        if landmarks is None:
+            analysis_results, landmarks = self._split_landmarks(analysis_results)
+        now = datetime.now()
+        values = self._row_values(now.isoformat(), image_path, patient_id, analysis_results)
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO results (timestamp, image_path, patient_id, grade, results) VALUES (?, ?, ?, ?, ?)',
+                values)
+            # Appended under the same lock, so store ids stay in increasing order
+            if landmarks is not None:
+                self.landmarks.append(landmarks, cursor.lastrowid, analysis_results.get('model_version', ''),
+                                      timestamp=now.timestamp())
+        return cursor.lastrowid
+
+    def get_landmarks(self, result_id):
+        """Stored (F, 68, 2) landmarks of one result; empty when none were saved"""
+        return self.landmarks.get(result_id)
+
+    def stored_grades(self):
+        """(ids, grades) arrays of every result in id order; unknown grades are 0"""
+        with self._lock:
+            rows = self.connection.execute('SELECT id, IFNULL(grade, 0) FROM results ORDER BY id')
+            values = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+        return values[:, 0], values[:, 1]
+
+    def save_rescored(self, config_version, result_ids, faces, overall_symmetry, grades):
+        """Record grades from a re-scoring pass next to the original ones, replacing an earlier pass"""
+        rows = zip(np.asarray(result_ids).tolist(), np.asarray(faces).tolist(), [config_version] * len(result_ids),
+                   np.asarray(overall_symmetry).tolist(), np.asarray(grades).tolist())
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO rescored (result_id, face, config_version, overall_symmetry, grade) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+
+    def get_rescored(self, result_id):
+        """{config_version: [{'face', 'overall_symmetry', 'grade'}, ...]} for one result"""
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT * FROM rescored WHERE result_id = ? ORDER BY config_version, face', (result_id,)).fetchall()
+        rescored = {}
+        for row in rows:
+            rescored.setdefault(row['config_version'], []).append(
+                {'face': row['face'], 'overall_symmetry': row['overall_symmetry'], 'grade': row['grade']})
+        return rescored
+
+    def _select(self, grade=None, patient_id=None, start=None, end=None, limit=None, offset=0, newest_first=False):
+        clauses, params = [], []
+        if grade is not None:
+            clauses.append('grade = ?')
+            params.append(grade)
+        if patient_id is not None:
+            clauses.append('patient_id = ?')
+            params.append(patient_id)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(start.isoformat() if isinstance(start, datetime) else start)
+        if end is not None:
+            clauses.append('timestamp < ?')
+            params.append(end.isoformat() if isinstance(end, datetime) else end)
+
+        sql = 'SELECT * FROM results'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id DESC' if newest_first else ' ORDER BY id'
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset]
+        return sql, params
+
+    def iter_results(self, batch_size=500, **filters):
+        """Stream matching results oldest first without loading them all into memory
+
+        Accepts the same filters as query(): grade, patient_id, start, end,
+        limit and offset.
+        """
+        sql, params = self._select(**filters)
+        cursor = self.connection.cursor()
+        with self._lock:
+            cursor.execute(sql, params)
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield self._entry(row)
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def query(self, grade=None, patient_id=None, start=None, end=None, limit=None, offset=0):
+        """Return one page of results matching all given filters, oldest first"""
+        return list(self.iter_results(grade=grade, patient_id=patient_id, start=start, end=end,
+                                      limit=limit, offset=offset))
+
+    def count(self, grade=None, patient_id=None, start=None, end=None):
+        sql, params = self._select(grade=grade, patient_id=patient_id, start=start, end=end)
+        with self._lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM ({sql})', params).fetchone()[0]
+
     def get_recent_results(self, count=5):
-        return self.results[-count:] if self.results else []
-    
-    def get_results_by_grade(self, grade):
-        return [r for r in self.results if r['results'].get('house_brackmann_grade') == grade]
+        sql, params = self._select(limit=count, newest_first=True)
+        with self._lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def get_results_by_grade(self, grade, limit=None, offset=0):
+        return self.query(grade=grade, limit=limit, offset=offset)
+
+    def get_results_in_range(self, start, end, limit=None, offset=0):
+        return self.query(start=start, end=end, limit=limit, offset=offset)
+
+    def get_results_by_patient(self, patient_id, limit=None, offset=0):
+        return self.query(patient_id=patient_id, limit=limit, offset=offset)
+
+    def close(self):
+        self.connection.close()
 
 # Usage example
 if __name__ == "__main__":
     manager = ResultsManager()
-    print(f"Stored results: {len(manager.results)}")
\ No newline at end of file
+    print(f"Stored results: {manager.count()}")
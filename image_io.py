@@ -0,0 +1,135 @@
+import base64
+import binascii
+import os
+
+import cv2
+import numpy as np
+
+
+def decode_image(source):
+    """Decode raw bytes, an already decoded ndarray or a file path into a BGR image"""
+    if isinstance(source, np.ndarray):
+        return source
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(source, dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    # Anything else is treated as a path on disk
+    return cv2.imread(source)
+
+
+def read_stream(stream, chunk_size=1 << 16):
+    """Read an upload stream into one growing buffer, chunk by chunk
+
+    Used for raw request bodies, so the payload is copied once into a
+    buffer decode_image() can use directly instead of being cached by the
+    framework and copied again.
+    """
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return buffer
+        buffer += chunk
+
+
+def decode_base64(data):
+    """Decode a base64 string or data URL (data:image/jpeg;base64,...) into bytes
+
+    Raises ValueError for anything but a string of base64 characters; line
+    breaks and other whitespace are ignored.
+    """
+    if not isinstance(data, str):
+        raise ValueError("expected a base64 string")
+    # Base64 has no commas, so anything up to one is a data URL header
+    if ',' in data:
+        data = data[data.index(',') + 1:]
+    try:
+        return base64.b64decode(''.join(data.split()), validate=True)
+    except binascii.Error as e:
+        raise ValueError(str(e)) from e
+
+
+def crop_padded(image, box, padding=0.25):
+    """Return the region around a (left, top, right, bottom) box and its (x, y) offset
+
+    The box is grown by `padding` times its width and height on every side
+    and clipped to the image. The crop is a view, so nothing is copied.
+    """
+    height, width = image.shape[:2]
+    left, top, right, bottom = box
+    pad_x, pad_y = padding * (right - left), padding * (bottom - top)
+    x0, y0 = max(0, int(left - pad_x)), max(0, int(top - pad_y))
+    x1, y1 = min(width, int(right + pad_x) + 1), min(height, int(bottom + pad_y) + 1)
+    return image[y0:y1, x0:x1], (x0, y0)
+
+
+def clip_boxes(boxes, shape):
+    """Clip (left, top, right, bottom) boxes to an image of `shape`, dropping boxes that fall outside it"""
+    height, width = shape[:2]
+    clipped = [(max(0, int(left)), max(0, int(top)), min(width - 1, int(right)), min(height - 1, int(bottom)))
+               for left, top, right, bottom in boxes]
+    return [box for box in clipped if box[2] > box[0] and box[3] > box[1]]
+
+
+def fit_width(image, max_width=None):
+    """Return (image, scale) downscaled to at most `max_width`; the original is returned unscaled otherwise"""
+    height, width = image.shape[:2]
+    if not max_width or width <= max_width:
+        return image, 1.0
+    scale = max_width / width
+    return cv2.resize(image, (max_width, max(1, int(round(height * scale)))), interpolation=cv2.INTER_AREA), scale
+
+
+def encode_image(image, ext='.png', params=None):
+    """Encode an image in memory and return the encoded bytes"""
+    success, buffer = cv2.imencode(ext, image, params or [])
+    if not success:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buffer.tobytes()
+
+
+PREVIEW_FORMATS = {
+    'png': ('.png', 'image/png'),
+    'jpeg': ('.jpg', 'image/jpeg'),
+    'webp': ('.webp', 'image/webp'),
+}
+
+
+def encode_preview(image, image_format='jpeg', max_width=None, quality=85):
+    """Encode a visualization for clients, downscaled to `max_width` if it is wider
+
+    Returns (bytes, file extension, MIME type). `quality` applies to JPEG and
+    WebP; PNG is lossless.
+    """
+    if image_format not in PREVIEW_FORMATS:
+        raise ValueError(f"Unknown preview format '{image_format}', choose from {', '.join(PREVIEW_FORMATS)}")
+    ext, mime_type = PREVIEW_FORMATS[image_format]
+
+    image, _ = fit_width(image, max_width)
+    params = {'jpeg': [cv2.IMWRITE_JPEG_QUALITY, quality],
+              'webp': [cv2.IMWRITE_WEBP_QUALITY, quality]}.get(image_format)
+    return encode_image(image, ext, params), ext, mime_type
+
+
+def preview_settings_from_env():
+    """encode_preview() options from FACIPA_VIS_FORMAT / FACIPA_VIS_WIDTH / FACIPA_VIS_QUALITY"""
+    return {'image_format': os.environ.get('FACIPA_VIS_FORMAT', 'jpeg'),
+            'max_width': int(os.environ.get('FACIPA_VIS_WIDTH', '1024')) or None,
+            'quality': int(os.environ.get('FACIPA_VIS_QUALITY', '85'))}
+
+
+def upload_settings_from_env():
+    """Upload limits from FACIPA_MAX_UPLOAD_MB / FACIPA_UPLOAD_MAX_DIM / FACIPA_UPLOAD_QUALITY
+
+    'max_bytes' becomes Flask's MAX_CONTENT_LENGTH (16 MB by default, 0 for
+    no limit). 'max_dimension' and 'quality' tell the web page how far to
+    downscale and how to JPEG-encode photos before uploading them.
+    """
+    max_mb = float(os.environ.get('FACIPA_MAX_UPLOAD_MB', '16'))
+    return {'max_bytes': int(max_mb * 1024 * 1024) if max_mb > 0 else None,
+            'max_dimension': int(os.environ.get('FACIPA_UPLOAD_MAX_DIM', '1600')),
+            'quality': float(os.environ.get('FACIPA_UPLOAD_QUALITY', '0.9'))}
@@ -0,0 +1,138 @@
+import os
+
+import cv2
+import numpy as np
+
+GATE_MODES = ('flag', 'reject')
+# Checks that only reject when measured inside a face box; without one they may be judging the backdrop
+FACE_CHECKS = ('underexposed', 'overexposed', 'clipped')
+
+
+class QualityGate:
+    def __init__(self, mode='flag', thumbnail_width=256, min_sharpness=15.0, min_brightness=40.0,
+                 max_brightness=220.0, max_clipped_fraction=0.5, min_face_size=64):
+        """Cheap check that catches blurry images and badly exposed or tiny faces around face detection
+
+        Every check runs on a grayscale thumbnail `thumbnail_width` pixels
+        wide, so it costs a few milliseconds even for large photos:
+        - sharpness is the variance of the Laplacian of the whole thumbnail
+        - brightness is the mean gray level, and the clipped fraction counts
+          pixels that are almost black or almost white. Both are measured
+          inside the face box when one is known, otherwise on the central
+          half of the image, so a bright or dark backdrop does not count
+        - the face size is the short side of the face box; without one it
+          is the image's short side, the largest face the image could hold
+        The analyzers assess each image before detection (with the caller's
+        face boxes if any) and again on the largest detected face. With mode
+        'reject' they return the report as the error when rejected() says so;
+        exposure measured without a face box is only flagged. With 'flag'
+        they analyze anyway and attach the report to the results.
+        """
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unknown quality gate mode '{mode}', choose from {', '.join(GATE_MODES)}")
+        self.mode = mode
+        self.thumbnail_width = thumbnail_width
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_clipped_fraction = max_clipped_fraction
+        self.min_face_size = min_face_size
+
+    @property
+    def rejects(self):
+        return self.mode == 'reject'
+
+    def rejected(self, report):
+        """True when a rejecting gate should turn the image of an assess() report away"""
+        if not self.rejects:
+            return False
+        return any(report['face_box'] is not None or issue['check'] not in FACE_CHECKS
+                   for issue in report['issues'])
+
+    def thumbnail(self, image):
+        height, width = image.shape[:2]
+        scale = min(1.0, self.thumbnail_width / width)
+        if scale < 1.0:
+            image = cv2.resize(image, (self.thumbnail_width, max(1, int(round(height * scale)))),
+                               interpolation=cv2.INTER_AREA)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return gray
+
+    def assess(self, image, box=None):
+        """Measure a decoded image and return {'passed', 'issues', 'measurements', 'face_box'}
+
+        `box` is the (left, top, right, bottom) face box exposure and face
+        size are measured on, when known. Each issue is {'check', 'value',
+        'limit', 'message'}; `passed` is True when there are none.
+        """
+        gray = self.thumbnail(image)
+        height, width = image.shape[:2]
+
+        if box is not None:
+            left, top, right, bottom = (int(round(value)) for value in box)
+            left, top, right, bottom = max(0, left), max(0, top), min(width, right), min(height, bottom)
+            face_size = min(right - left, bottom - top)
+        else:
+            left, top, right, bottom = width // 4, height // 4, width - width // 4, height - height // 4
+            face_size = min(width, height)
+        if right <= left or bottom <= top:
+            region = gray
+        else:
+            region = self.thumbnail(image[top:bottom, left:right])
+
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        brightness = float(region.mean())
+        histogram = np.bincount(region.ravel(), minlength=256)
+        clipped_fraction = float((histogram[:8].sum() + histogram[248:].sum()) / region.size)
+
+        measurements = {
+            'width': width,
+            'height': height,
+            'sharpness': round(sharpness, 2),
+            'brightness': round(brightness, 2),
+            'clipped_fraction': round(clipped_fraction, 4),
+            'exposure_region': [left, top, right, bottom],
+            ('face_size' if box is not None else 'max_face_size'): face_size,
+        }
+
+        issues = []
+
+        def check(name, failed, value, limit, message):
+            if failed:
+                issues.append({'check': name, 'value': value, 'limit': limit, 'message': message})
+
+        check('blur', sharpness < self.min_sharpness, measurements['sharpness'], self.min_sharpness,
+              'Image is too blurry')
+        subject = 'Face' if box is not None else 'Image'
+        check('underexposed', brightness < self.min_brightness, measurements['brightness'], self.min_brightness,
+              f'{subject} is too dark')
+        check('overexposed', brightness > self.max_brightness, measurements['brightness'], self.max_brightness,
+              f'{subject} is too bright')
+        check('clipped', clipped_fraction > self.max_clipped_fraction, measurements['clipped_fraction'],
+              self.max_clipped_fraction, f'Too much of the {subject.lower()} is pure black or white')
+        check('too_small', face_size < self.min_face_size, face_size, self.min_face_size,
+              'Face is too small for reliable landmarks' if box is not None else
+              'Image is too small to hold a face large enough for reliable landmarks')
+
+        return {'passed': not issues, 'issues': issues, 'measurements': measurements,
+                'face_box': None if box is None else [left, top, right, bottom]}
+
+    def assess_faces(self, image, boxes=None):
+        """assess() on the largest of the (left, top, right, bottom) `boxes`, or without a box when there are none"""
+        box = max(boxes, key=lambda box: (box[2] - box[0]) * (box[3] - box[1])) if boxes else None
+        return self.assess(image, box)
+
+
+def quality_gate_from_env():
+    """QualityGate from FACIPA_QUALITY_GATE (off, flag or reject; flag by default)
+
+    FACIPA_MIN_SHARPNESS and FACIPA_MIN_FACE_SIZE override the thresholds.
+    Returns None when the gate is off. Rejecting is opt-in; with the default
+    'flag' responses only gain a 'quality' report.
+    """
+    mode = os.environ.get('FACIPA_QUALITY_GATE', 'flag')
+    if mode == 'off':
+        return None
+    return QualityGate(mode=mode,
+                       min_sharpness=float(os.environ.get('FACIPA_MIN_SHARPNESS', '15')),
+                       min_face_size=int(os.environ.get('FACIPA_MIN_FACE_SIZE', '64')))
@@ -0,0 +1,285 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import closing
+from urllib.parse import urlsplit
+
+
+class RetryLater(Exception):
+    """Raised by a handler when the job should go back to the queue and be retried"""
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue already holds its maximum of pending jobs"""
+
+
+class InvalidCallbackError(ValueError):
+    """Raised by submit() for a callback URL that is not http(s) or whose host is not allowed"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at a host outside the allow-list
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    def __init__(self, handler, database='analysis_jobs.db', workers=2, keep_seconds=24 * 3600,
+                 retry_exceptions=(RetryLater,), callback_hosts=(), max_pending=None):
+        """SQLite-backed job queue drained by a pool of worker threads
+
+        `handler(payload, options)` receives the stored image bytes and
+        options dict and returns a JSON-serializable result. Jobs survive a
+        restart: anything left running is queued again on startup. Finished
+        jobs are purged after `keep_seconds`.
+
+        Callback URLs must be http(s) and their host must be listed in
+        `callback_hosts`; with no hosts listed, callbacks are refused.
+        Redirects are not followed. With `max_pending` set, submit() raises
+        QueueFullError while that many jobs are queued or running.
+        """
+        self.handler = handler
+        self.max_pending = max_pending
+        self.callback_hosts = frozenset(host.lower() for host in callback_hosts)
+        self.database = database
+        self.keep_seconds = keep_seconds
+        self.retry_exceptions = retry_exceptions
+        self._wake = threading.Condition()
+        self._stopping = False
+
+        with closing(self._connect()) as connection:
+            connection.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    options TEXT,
+                    callback_url TEXT,
+                    payload BLOB,
+                    result TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            ''')
+            connection.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+
+        self._threads = [threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def check_callback_url(self, callback_url):
+        """Raise InvalidCallbackError unless the server may POST to `callback_url`"""
+        parts = urlsplit(callback_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise InvalidCallbackError("callback_url must be an http or https URL")
+        if not self.callback_hosts:
+            raise InvalidCallbackError("Job callbacks are not enabled on this server")
+        if parts.hostname.lower() not in self.callback_hosts:
+            raise InvalidCallbackError(f"callback_url host '{parts.hostname}' is not allowed")
+
+    def submit(self, payload, options=None, callback_url=None):
+        """Queue a job and return its id immediately
+
+        Raises InvalidCallbackError for a callback URL the queue may not call
+        and QueueFullError when `max_pending` jobs are waiting.
+        """
+        if callback_url:
+            self.check_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as connection:
+            # Count and insert in one write transaction so concurrent submits can't overshoot the cap
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if self.max_pending is not None:
+                    pending = connection.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+                    if pending >= self.max_pending:
+                        raise QueueFullError(f"Job queue is full ({pending} jobs pending)")
+                connection.execute(
+                    'INSERT INTO jobs (id, status, created_at, options, callback_url, payload) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, 'queued', time.time(), json.dumps(options or {}), callback_url or None,
+                     sqlite3.Binary(payload)))
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job's status (and result or error once finished), or None"""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                'SELECT id, status, created_at, started_at, finished_at, result, error FROM jobs WHERE id = ?',
+                (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = {key: row[key] for key in ('id', 'status', 'created_at', 'started_at', 'finished_at')}
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        if row['error'] is not None:
+            job['error'] = row['error']
+        return job
+
+    def stats(self):
+        with closing(self._connect()) as connection:
+            rows = connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim(self, connection):
+        """Atomically move the oldest queued job to running and return it"""
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT id, options, callback_url, payload FROM jobs WHERE status = 'queued' "
+                "ORDER BY created_at LIMIT 1").fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                                   (time.time(), row['id']))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def _work(self):
+        connection = self._connect()
+        failures = 0
+        while not self._stopping:
+            try:
+                self._step(connection)
+                failures = 0
+            except Exception as e:
+                # A locked or full database must not end the worker and leave jobs queued for good
+                failures += 1
+                delay = min(30.0, 0.5 * 2 ** (failures - 1))
+                print(f"Job worker error ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                with self._wake:
+                    self._wake.wait(timeout=delay)
+        connection.close()
+
+    def _step(self, connection):
+        """Run the next queued job, or purge expired jobs and wait when there is none"""
+        job = self._claim(connection)
+        if job is None:
+            connection.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                               (time.time() - self.keep_seconds,))
+            with self._wake:
+                self._wake.wait(timeout=1.0)
+            return
+
+        try:
+            result = self.handler(bytes(job['payload']), json.loads(job['options']))
+        except self.retry_exceptions:
+            connection.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ?", (job['id'],))
+            time.sleep(0.5)
+            return
+        except Exception as e:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, payload = NULL WHERE id = ?",
+                (time.time(), str(e), job['id']))
+        else:
+            connection.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, result = ?, payload = NULL WHERE id = ?",
+                (time.time(), json.dumps(result), job['id']))
+
+        if job['callback_url']:
+            self._notify(job['callback_url'], self.get(job['id']))
+
+    def _notify(self, callback_url, job):
+        """POST the finished job to its callback URL; failures don't affect the job"""
+        try:
+            # Checked again in case the allow-list changed since the job was queued
+            self.check_callback_url(callback_url)
+            request = urllib.request.Request(callback_url, data=json.dumps(job).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'}, method='POST')
+            _callback_opener.open(request, timeout=10).close()
+        except Exception as e:
+            print(f"Job callback to {callback_url} failed: {e}")
+
+    def shutdown(self):
+        self._stopping = True
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class LazyJobQueue:
+    def __init__(self, factory):
+        """Creates the job queue with `factory()` on first use
+
+        Importing an app then neither creates its database nor starts job
+        workers; the queue is opened by the first /jobs request, or at
+        startup by the app's __main__ so jobs left over from a restart
+        resume.
+        """
+        self._factory = factory
+        self._queue = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    self._queue = self._factory()
+        return self._queue
+
+    def start(self):
+        """Open the queue now, resuming the jobs a previous run left behind"""
+        return self.queue
+
+    def submit(self, payload, options=None, callback_url=None):
+        return self.queue.submit(payload, options, callback_url=callback_url)
+
+    def get(self, job_id):
+        return self.queue.get(job_id)
+
+
+def job_queue_from_env(handler, database='analysis_jobs.db', retry_exceptions=(RetryLater,)):
+    """Create the job queue from the FACIPA_JOB_* / FACIPA_DATA_DIR / FACIPA_CALLBACK_HOSTS settings
+
+    FACIPA_JOB_WORKERS sets the worker threads (2 by default). The database
+    is FACIPA_JOB_DB if set, otherwise `database` inside FACIPA_DATA_DIR
+    ('data' by default). FACIPA_JOB_MAX_PENDING caps the queued and running
+    jobs (100 by default, 0 for no cap). FACIPA_CALLBACK_HOSTS is a
+    comma-separated allow-list of callback URL hosts; callbacks are refused
+    when it is unset. Each service should use its own database, since a
+    queue's workers run every job it holds through its own handler.
+
+    Returns None inside worker processes so they don't drain the queue too.
+    """
+    if multiprocessing.parent_process() is not None:
+        return None
+    path = os.environ.get('FACIPA_JOB_DB') or os.path.join(os.environ.get('FACIPA_DATA_DIR', 'data'), database)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    max_pending = int(os.environ.get('FACIPA_JOB_MAX_PENDING', '100'))
+    return JobQueue(handler,
+                    database=path,
+                    workers=int(os.environ.get('FACIPA_JOB_WORKERS', '2')),
+                    retry_exceptions=retry_exceptions,
+                    callback_hosts=[host.strip() for host in os.environ.get('FACIPA_CALLBACK_HOSTS', '').split(',')
+                                    if host.strip()],
+                    max_pending=max_pending or None)
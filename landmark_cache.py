@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def model_version(predictor_path, *extra):
+    """Identify a predictor file (name and size) plus any detection settings"""
+    size = os.path.getsize(predictor_path) if os.path.exists(predictor_path) else 0
+    return '|'.join([os.path.basename(predictor_path), str(size)] + [str(item) for item in extra])
+
+
+class LandmarkCache:
+    def __init__(self, max_entries=256, cache_dir=None):
+        """Content-addressed cache of face boxes and 68-point landmarks
+
+        Entries live in a bounded in-memory LRU and, when `cache_dir` is set,
+        in .npz files on disk that survive restarts and are shared between
+        worker processes.
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Worker processes get the same settings with an empty memory tier
+        return {'max_entries': self.max_entries, 'cache_dir': self.cache_dir}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def make_key(self, image, version):
+        """Hash the decoded pixels together with the model version"""
+        pixels = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(version.encode('utf-8'))
+        digest.update(str((pixels.shape, pixels.dtype.str)).encode('utf-8'))
+        digest.update(pixels.data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npz')
+
+    def get(self, key):
+        """Return (boxes, landmarks) arrays for `key`, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if not self.cache_dir or not os.path.exists(self._path(key)):
+            return None
+
+        with np.load(self._path(key)) as data:
+            entry = (data['boxes'], data['landmarks'])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, boxes, landmarks):
+        """Store the face boxes (F, 4) and landmarks (F, 68, 2) found for an image"""
+        entry = (np.asarray(boxes, dtype=np.int32).reshape(-1, 4),
+                 np.asarray(landmarks, dtype=np.int32).reshape(-1, 68, 2))
+        self._remember(key, entry)
+
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+            np.savez(temp_path, boxes=entry[0], landmarks=entry[1])
+            os.replace(temp_path, path)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def cache_from_env():
+    """Create a cache from FACIPA_CACHE_SIZE / FACIPA_CACHE_DIR, or None when disabled"""
+    max_entries = int(os.environ.get('FACIPA_CACHE_SIZE', '256'))
+    if max_entries <= 0:
+        return None
+    return LandmarkCache(max_entries=max_entries, cache_dir=os.environ.get('FACIPA_CACHE_DIR') or None)
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+
+def _smoothing_factor(elapsed, cutoff):
+    """Exponential smoothing weight for a low-pass filter at `cutoff` Hz (scalar or array)"""
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / elapsed)
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=1.0, beta=0.05, derivative_cutoff=1.0):
+        """One-Euro low-pass filter over a whole landmark array at once
+
+        Slow movements are smoothed with a cutoff near `min_cutoff` Hz,
+        which removes detector jitter. The cutoff rises with speed by `beta`,
+        so fast expressions are followed without lag. Every coordinate is
+        filtered independently, so one call handles all 68 points.
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        """Forget the previous sample, e.g. after the face was lost"""
+        self._previous = None
+        self._derivative = None
+        self._timestamp = None
+
+    def __call__(self, points, timestamp):
+        """Return the filtered copy of `points` observed at `timestamp` seconds"""
+        points = np.asarray(points, dtype=np.float64)
+        if self._previous is None:
+            self._previous = points
+            self._derivative = np.zeros_like(points)
+            self._timestamp = timestamp
+            return points
+
+        # Fall back to a nominal 30 fps when timestamps repeat
+        elapsed = timestamp - self._timestamp if timestamp > self._timestamp else 1 / 30
+        self._timestamp = timestamp
+
+        derivative = (points - self._previous) / elapsed
+        alpha = _smoothing_factor(elapsed, self.derivative_cutoff)
+        self._derivative = alpha * derivative + (1 - alpha) * self._derivative
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self._derivative)
+        alpha = _smoothing_factor(elapsed, cutoff)
+        self._previous = alpha * points + (1 - alpha) * self._previous
+        return self._previous
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# One raw little-endian file per column; row i of every column describes the same face
+COLUMNS = {
+    'ids': np.dtype('<i8'),
+    'faces': np.dtype('<u1'),
+    'timestamps': np.dtype('<f8'),
+    'models': np.dtype('<u2'),
+}
+LANDMARK_DTYPES = {'int16': np.dtype('<i2'), 'float32': np.dtype('<f4')}
+
+
+class LandmarkStore:
+    def __init__(self, path, dtype='int16'):
+        """Append-only, memory-mappable store of 68-point landmark sets
+
+        The store is a directory of raw column files:
+        - landmarks.bin holds an (N, 68, 2) array of int16 (whole pixels) or
+          float32 points
+        - ids.bin, faces.bin, timestamps.bin and models.bin hold the caller's
+          record id, the face index within that record, the Unix time and
+          an index into the model versions listed in meta.json
+        Reading maps the files with np.memmap, so a re-scoring pass over
+        millions of faces streams from disk instead of loading Python lists.
+        The dtype is fixed when the store is created.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(path, 'meta.json')
+        os.makedirs(path, exist_ok=True)
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta['format_version'] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported landmark store format {self.meta['format_version']} in {path}")
+        else:
+            if dtype not in LANDMARK_DTYPES:
+                raise ValueError(f"Unknown landmark dtype '{dtype}', choose from {', '.join(LANDMARK_DTYPES)}")
+            self.meta = {'format_version': FORMAT_VERSION, 'dtype': dtype, 'model_versions': []}
+            self._write_meta()
+
+        self.dtype = LANDMARK_DTYPES[self.meta['dtype']]
+
+    def _file(self, column):
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _write_meta(self):
+        temp_path = f"{self._meta_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temp_path, self._meta_path)
+
+    def _model_index(self, model_version):
+        versions = self.meta['model_versions']
+        if model_version not in versions:
+            versions.append(model_version)
+            self._write_meta()
+        return versions.index(model_version)
+
+    def __len__(self):
+        # ids.bin is written last, so it only counts fully written faces
+        path = self._file('ids')
+        return os.path.getsize(path) // COLUMNS['ids'].itemsize if os.path.exists(path) else 0
+
+    def append(self, landmarks, record_id, model_version='', timestamp=None):
+        """Store the (F, 68, 2) landmarks of the F faces found for one record"""
+        points = np.asarray(landmarks, dtype=np.float64).reshape(-1, 68, 2)
+        if self.dtype.kind == 'i':
+            points = np.rint(points)
+        count = len(points)
+        if count == 0:
+            return
+
+        with self._lock:
+            columns = {
+                'landmarks': points.astype(self.dtype),
+                'faces': np.arange(count, dtype=COLUMNS['faces']),
+                'timestamps': np.full(count, time.time() if timestamp is None else timestamp, COLUMNS['timestamps']),
+                'models': np.full(count, self._model_index(model_version), COLUMNS['models']),
+                'ids': np.full(count, record_id, COLUMNS['ids']),
+            }
+            # Truncate a partially written face left by a crash before appending
+            committed = len(self)
+            for column, values in columns.items():
+                row_size = values.itemsize * (68 * 2 if column == 'landmarks' else 1)
+                with open(self._file(column), 'ab') as f:
+                    f.truncate(committed * row_size)
+                    f.write(values.tobytes())
+
+    def arrays(self):
+        """Read-only memory maps of every column, trimmed to the committed faces
+
+        Returns a dict with 'landmarks' (N, 68, 2), 'ids', 'faces',
+        'timestamps' and 'models'. Use model_versions()[models[i]] for the
+        model version of face i.
+        """
+        count = len(self)
+        arrays = {}
+        for column, dtype in dict(COLUMNS, landmarks=self.dtype).items():
+            shape = (count, 68, 2) if column == 'landmarks' else (count,)
+            if count == 0:
+                arrays[column] = np.empty(shape, dtype)
+            else:
+                arrays[column] = np.memmap(self._file(column), dtype=dtype, mode='r', shape=shape)
+        return arrays
+
+    def model_versions(self):
+        return list(self.meta['model_versions'])
+
+    def iter_chunks(self, chunk_size=100000):
+        """Yield dicts of column slices of at most `chunk_size` faces, for vectorized re-scoring"""
+        arrays = self.arrays()
+        for start in range(0, len(arrays['ids']), chunk_size):
+            yield {column: values[start:start + chunk_size] for column, values in arrays.items()}
+
+    def get(self, record_id):
+        """Landmarks (F, 68, 2) of one record; ids must have been appended in increasing order"""
+        arrays = self.arrays()
+        start, end = np.searchsorted(arrays['ids'], [record_id, record_id + 1])
+        return np.array(arrays['landmarks'][start:end])
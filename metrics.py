@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+PIXELS_BUCKETS = (0.1e6, 0.3e6, 1e6, 2e6, 5e6, 12e6, 24e6)
+
+
+def record_stage(timings, stage, stage_start):
+    """Add the time since `stage_start` to `timings[stage]` and restart the clock"""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - stage_start
+    return now
+
+
+def image_info(source, image):
+    """Size of the uploaded payload and of the decoded image, for traces"""
+    info = {}
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        info['bytes'] = len(source)
+    if image is not None:
+        info['width'], info['height'] = int(image.shape[1]), int(image.shape[0])
+    return info
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self, namespace='facipa'):
+        """In-process counters and histograms rendered in the Prometheus text format
+
+        Analyses running in worker processes report their stage timings back
+        in the result trace, so everything is observed here in the web
+        process and one /metrics scrape covers the whole service.
+        """
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_trace(self, trace):
+        """Record the stage durations and image sizes from an analysis trace"""
+        for stage, seconds in trace.get('stages', {}).items():
+            self.observe('stage_seconds', seconds, stage=stage)
+        image = trace.get('image', {})
+        if 'bytes' in image:
+            self.observe('image_bytes', image['bytes'], buckets=BYTES_BUCKETS)
+        if 'width' in image:
+            self.observe('image_pixels', image['width'] * image['height'], buckets=PIXELS_BUCKETS)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted((key, value) for key, value in self._counters.items())
+            histograms = sorted(((key, list(h.counts), h.sum, h.buckets) for key, h in self._histograms.items()),
+                                key=lambda item: item[0])
+
+        lines, described = [], set()
+
+        def header(name, default_kind):
+            full_name = f"{self.namespace}_{name}"
+            if name not in described:
+                described.add(name)
+                kind, help_text = self._help.get(name, (default_kind, name.replace('_', ' ')))
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+            return full_name
+
+        for (name, labels), value in counters:
+            full_name = header(name, 'counter')
+            lines.append(f"{full_name}{self._labels(labels)} {value}")
+
+        for (name, labels), counts, total, buckets in histograms:
+            full_name = header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f"{full_name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{full_name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{full_name}_count{self._labels(labels)} {cumulative}")
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('stage_seconds', 'histogram', 'Seconds spent in each analysis stage')
+metrics.describe('image_bytes', 'histogram', 'Size of uploaded images in bytes')
+metrics.describe('image_pixels', 'histogram', 'Decoded image size in pixels')
+metrics.describe('request_seconds', 'histogram', 'HTTP request latency by endpoint')
+metrics.describe('requests_total', 'counter', 'HTTP requests by endpoint and status code')
+
+
+def instrument_app(app, registry=metrics):
+    """Time every request of a Flask app and serve the registry at /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None and request.endpoint != 'metrics':
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.observe('request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            registry.inc('requests_total', endpoint=endpoint, status=response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'], endpoint='metrics')
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from functools import partial
+
+DEFAULT_PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
+
+
+class ModelRegistry:
+    def __init__(self):
+        """Process-wide store that loads each model lazily, exactly once
+
+        Models loaded in a parent process before it forks its workers are
+        inherited copy-on-write, so workers don't pay for a second load.
+        """
+        self._models = {}
+        self._status = {}
+        self._warm_up_thread = None
+        self._warm_up_errors = []
+        self._reset_locks()
+        if hasattr(os, 'register_at_fork'):
+            # A lock held by another thread at fork time would never be released in the child
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key_lock(self, name):
+        with self._lock:
+            return self._key_locks.setdefault(name, threading.Lock())
+
+    def get(self, name, loader):
+        """Return the model registered as `name`, calling `loader()` on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        # Per-model lock: concurrent callers wait for one load instead of loading twice
+        with self._key_lock(name):
+            if name in self._models:
+                return self._models[name]
+
+            self._status[name] = {'state': 'loading'}
+            start = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                self._status[name] = {'state': 'failed', 'error': str(e)}
+                raise
+            self._models[name] = model
+            self._status[name] = {'state': 'ready', 'load_seconds': round(time.perf_counter() - start, 3)}
+            return model
+
+    def warm_up(self, *loaders, background=True):
+        """Load models ahead of the first request
+
+        Each loader is a zero-argument callable such as
+        partial(get_shape_predictor, path). Failures are recorded in status(),
+        which reports 'failed' from then on, rather than raised when loading in
+        the background.
+        """
+        def run():
+            for loader in loaders:
+                try:
+                    loader()
+                except Exception as e:
+                    self._warm_up_errors.append(str(e))
+                    print(f"Model warm-up failed: {e}")
+
+        if not background:
+            run()
+            return
+
+        self._warm_up_thread = threading.Thread(target=run, name='model-warm-up', daemon=True)
+        self._warm_up_thread.start()
+
+    def is_ready(self):
+        warming = self._warm_up_thread is not None and self._warm_up_thread.is_alive()
+        return not warming and all(status['state'] == 'ready' for status in self._status.values())
+
+    def errors(self):
+        """Messages of the failed model loads, including warm-up loaders that failed outside get()"""
+        errors = [status['error'] for status in self._status.values() if status['state'] == 'failed']
+        return list(dict.fromkeys(errors + self._warm_up_errors))
+
+    def state(self):
+        """'failed' once a model load has failed, else 'ready' or 'warming_up'"""
+        if self.errors():
+            return 'failed'
+        return 'ready' if self.is_ready() else 'warming_up'
+
+    def status(self):
+        status = {'state': self.state(), 'ready': self.is_ready(),
+                  'models': {name: dict(status) for name, status in self._status.items()}}
+        if status['state'] == 'failed':
+            status['errors'] = self.errors()
+        return status
+
+
+registry = ModelRegistry()
+
+
+def get_shape_predictor(path=DEFAULT_PREDICTOR_PATH):
+    import dlib
+    return registry.get(f"shape_predictor:{path}", partial(dlib.shape_predictor, path))
+
+
+def get_frontal_face_detector():
+    import dlib
+    return registry.get("dlib_hog_detector", dlib.get_frontal_face_detector)
@@ -6,6 +6,10 @@ import imutils
 import dlib
 import cv2
 import json
+import time
+from symmetry_metrics import compute_features
+from model_registry import get_frontal_face_detector, get_shape_predictor
+from metrics import record_stage
 
 #costruct the argument parser and parse tha arguments
 #ap=argparse.ArgumentParser()
@@ -49,28 +53,33 @@ def shape_to_np(shape, dtype="int"):
 	# return the list of (x, y)-coordinates
 	return coords
 
-def resim_analiz(imageP, shape_predictor):
+def resim_analiz(imageP, shape_predictor, timings=None, show=True):
+    #timings verilirse her aşamanın süresi (saniye) bu sözlüğe eklenir
+    #show=False sonuç penceresini açmaz (benchmark ve sunucular için)
 
     #initialize dlib's face detector(HoG-based) and then create
     #the facial landmarks predictor
-    sayac = 0 #nokta sayısı
-    sum=0 #kayma olan bölge sayısı
-
 
     durum = dict()
     durum["status"] = False # status=False
+    durum["faces"] = [] #yüz başına durum
 
-    corarray=[]
-    detector=dlib.get_frontal_face_detector()
-    predictor=dlib.shape_predictor(shape_predictor)
+    shapes=[] #her yüzün (68, 2) noktaları
+    #modeller süreç başına bir kez yüklenir, sonraki çağrılar aynı nesneleri kullanır
+    detector=get_frontal_face_detector()
+    predictor=get_shape_predictor(shape_predictor)
 
     #load the input image, redize it, and convet it grayscale
+    stage_start=time.perf_counter()
     image=cv2.imread(imageP)
+    stage_start=record_stage(timings, "decode", stage_start)
     image=imutils.resize(image, width=500)
     gray=cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    stage_start=record_stage(timings, "resize", stage_start)
 
     #detect faces in the grayscale image
     rects=detector(gray,1)
+    stage_start=record_stage(timings, "detect", stage_start)
 
     #loop over the face detections
     for(i, rect) in enumerate(rects):
@@ -80,6 +89,8 @@ def resim_analiz(imageP, shape_predictor):
         #array
         shape=predictor(gray,rect)
         shape=face_utils.shape_to_np(shape)
+        shapes.append(shape)
+        stage_start=record_stage(timings, "predict", stage_start)
 
         #convert slib's rectangle to a OpenCv-style bounding box
         #[i.e., (x,y,w,h)] then draw the face bounding box
@@ -91,57 +102,44 @@ def resim_analiz(imageP, shape_predictor):
         #loop over the(x,y)-cordinates for the facial landmarks
         #and draw them on the image
         for (x,y) in shape:
-
-            corarray.append(y)
-            print(sayac,x,y)
-            sayac = sayac + 1
             cv2.circle(image,(x,y),3,(0,255,0),-1)
-
-    #show the output image with the face detections+facial labdmarks
-    eyebrowri=corarray[21] #22.noktanın y değeri
-    eyebrowrj=corarray[17] #18.noktanın y değeri
-    eyebrowli=corarray[22] #23.noktanın y değeri
-    eyebrowlj=corarray[26] #27.noktanın y değeri
-    farkeyebrowi=abs(eyebrowri-eyebrowli) #kaş kayma miktari(i)
-    farkeyebrowj=abs(eyebrowrj-eyebrowlj) #kaş kayma miktari(j)
-    print(eyebrowri, eyebrowrj, eyebrowli, eyebrowlj, farkeyebrowi, farkeyebrowj)
-
-    eyeri=corarray[39] #40.noktanın y değeri
-    eyerj=corarray[36] #37.noktanın y değeri
-    eyeli=corarray[42] #43.noktanın y değeri
-    eyelj=corarray[45] #46.noktanın y değeri
-    farkeyei=abs(eyeri-eyeli) #göz kayma miktari(i)
-    farkeyej=abs(eyerj-eyelj) #göz kayma miktari(j)
-    print(eyeri, eyerj, eyeli, eyelj, farkeyei, farkeyej)
-
-    noser=corarray[31] #32.noktanın y değeri
-    nosel=corarray[35] #36.noktanın y değeri
-    farknose=abs(nosel-noser) #burun kayma miktari(i)
-    print(noser, nosel, farknose)
-    lipr=corarray[48] #49.noktanın y değeri
-    lipl=corarray[54] #55.noktanın y değeri
-    farklip=abs(lipl-lipr) #burun kayma miktari(i)
-    print(lipr, lipl, farklip)
-
-    if (farkeyebrowi >= 15):
-        sum = sum + 1
-    if (farkeyebrowj):
-        sum = sum + 1
-    if (farkeyei >= 15):
-        sum = sum + 1
-    if (farkeyebrowj >= 15):
-        sum = sum + 1
-    if (farknose >= 13):
-        sum = sum + 1
-    if (farklip >= 10):
-        sum = sum + 1
-    if (sum >= 2):
-        durum["status"] = True
+        stage_start=record_stage(timings, "draw", stage_start)
+
+    if not shapes:
+        print("Yüz bulunamadı")
+        return durum
+
+    #tüm yüzlerin kayma miktarları tek seferde hesaplanır, her yüz ayrı değerlendirilir
+    features=compute_features(np.array(shapes))
+    farkeyebrowi=features["brow_inner_height_diff"] #kaş kayma miktari(i), 22. ve 23. noktalar
+    farkeyebrowj=features["brow_outer_height_diff"] #kaş kayma miktari(j), 18. ve 27. noktalar
+    print(farkeyebrowi, farkeyebrowj)
+
+    farkeyei=features["eye_inner_height_diff"] #göz kayma miktari(i), 40. ve 43. noktalar
+    farkeyej=features["eye_outer_height_diff"] #göz kayma miktari(j), 37. ve 46. noktalar
+    print(farkeyei, farkeyej)
+
+    farknose=features["nose_wing_height_diff"] #burun kayma miktari(i), 32. ve 36. noktalar
+    print(farknose)
+    farklip=features["mouth_corner_height_diff"] #dudak kayma miktari(i), 49. ve 55. noktalar
+    print(farklip)
+
+    #her yüz için kayma olan bölge sayısı
+    sum = ((farkeyebrowi >= 15).astype(int)
+           + (farkeyebrowj != 0)
+           + (farkeyei >= 15)
+           + (farkeyebrowj >= 15)
+           + (farknose >= 13)
+           + (farklip >= 10))
+    durum["faces"] = [bool(face) for face in sum >= 2] #yüz sırası rects ile aynı
+    durum["status"] = any(durum["faces"]) #herhangi bir yüzde felç bulgusu
 
     print("Felç Durumu: ", durum["status"])
+    record_stage(timings, "score", stage_start)
 
-    cv2.imshow("Output",image)
-    cv2.waitKey(0)
+    if show:
+        cv2.imshow("Output",image)
+        cv2.waitKey(0)
     return durum
 
 
@@ -0,0 +1,189 @@
+"""Recompute House-Brackmann grades for stored analyses from their saved landmarks
+
+    python rescoring.py --config web-v1 --report diff.json
+    python rescoring.py --config thresholds.json --baseline analyzer-v1 --dry-run
+
+A scoring configuration is a preset name or a JSON file such as
+
+    {"version": "clinic-2024-06", "intercept": 0,
+     "weights": {"eye_width_symmetry": 33.3, "mouth_corner_symmetry": 33.3, "brow_offset_symmetry": 33.3},
+     "thresholds": [92, 80, 60, 40, 20]}
+
+The overall symmetry is intercept + sum(weight * feature) over the
+compute_features() features, clipped to [0, 100]. A face gets grade 1 when it
+reaches the first threshold, grade 2 when it reaches the second, and so on
+down to grade 6. New grades are stored next to the original ones under the
+config version, and a diff report compares them with the stored grades or
+with a --baseline config.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from get_status import ResultsManager
+from symmetry_metrics import compute_features
+
+FEATURE_NAMES = sorted(compute_features(np.zeros((0, 68, 2))))
+
+# The two scoring rules currently live in the analyzers; these presets reproduce them
+SCORING_PRESETS = {
+    # EnhancedFacialParalysisAnalyzer: mean of eye, mouth and brow ratio symmetry
+    'analyzer-v1': {
+        'version': 'analyzer-v1',
+        'intercept': 0.0,
+        'weights': {'eye_width_symmetry': 100 / 3, 'mouth_corner_symmetry': 100 / 3, 'brow_offset_symmetry': 100 / 3},
+        'thresholds': [90, 80, 60, 40, 20],
+    },
+    # web_app.FacialParalysisAnalyzer: 100 minus ten times the mirrored half-face difference
+    'web-v1': {
+        'version': 'web-v1',
+        'intercept': 100.0,
+        'weights': {'half_mirror_diff': -10.0},
+        'thresholds': [95, 80, 60, 40, 20],
+    },
+}
+
+
+def load_config(name_or_path):
+    """Return a validated scoring config from a preset name or a JSON file"""
+    if name_or_path in SCORING_PRESETS:
+        config = dict(SCORING_PRESETS[name_or_path])
+    elif not os.path.exists(name_or_path):
+        raise ValueError(f"'{name_or_path}' is neither a scoring preset ({', '.join(SCORING_PRESETS)}) nor a file")
+    else:
+        with open(name_or_path) as f:
+            config = json.load(f)
+
+    for key in ('version', 'weights', 'thresholds'):
+        if key not in config:
+            raise ValueError(f"Scoring config is missing '{key}'")
+    unknown = sorted(set(config['weights']) - set(FEATURE_NAMES))
+    if unknown:
+        raise ValueError(f"Unknown features in scoring config: {', '.join(unknown)}")
+    thresholds = config['thresholds']
+    if len(thresholds) != 5 or any(a <= b for a, b in zip(thresholds, thresholds[1:])):
+        raise ValueError("Scoring config needs 5 strictly decreasing thresholds (grades 1-5)")
+    config.setdefault('intercept', 0.0)
+    return config
+
+
+def score_landmarks(landmarks, config):
+    """Vectorized (overall_symmetry, grade) arrays for N faces of (N, 68, 2) landmarks"""
+    features = compute_features(landmarks)
+    overall = np.full(len(features[FEATURE_NAMES[0]]), float(config['intercept']))
+    for name, weight in config['weights'].items():
+        overall += weight * features[name]
+    # Rounded like the analyzers round their reported scores before grading
+    overall = np.round(np.clip(np.nan_to_num(overall), 0, 100), 2)
+    grades = 1 + (overall[:, np.newaxis] < np.asarray(config['thresholds'], dtype=np.float64)).sum(axis=1)
+    return overall, grades
+
+
+class DiffReport:
+    def __init__(self, config_version, baseline):
+        """Accumulates a 6x6 old -> new grade transition matrix over re-scored chunks"""
+        self.config_version = config_version
+        self.baseline = baseline
+        self.faces = 0
+        self.transitions = np.zeros((7, 7), dtype=np.int64)
+
+    def add(self, old_grades, new_grades):
+        """Count one chunk; faces whose old grade is unknown (0) are only counted in 'faces'"""
+        self.faces += len(new_grades)
+        known = old_grades > 0
+        self.transitions += np.bincount(old_grades[known] * 7 + new_grades[known], minlength=49).reshape(7, 7)
+
+    def to_dict(self):
+        matrix = self.transitions[1:, 1:]
+        grades = range(1, 7)
+        compared = int(matrix.sum())
+        changed = compared - int(np.trace(matrix))
+        shift = (np.arange(1, 7)[np.newaxis, :] - np.arange(1, 7)[:, np.newaxis]) * matrix
+        return {
+            'config_version': self.config_version,
+            'baseline': self.baseline,
+            'faces': self.faces,
+            'compared': compared,
+            'changed': changed,
+            'upgraded': int(np.triu(matrix, 1).sum()),
+            'downgraded': int(np.tril(matrix, -1).sum()),
+            'mean_grade_shift': round(float(shift.sum()) / compared, 4) if compared else 0.0,
+            'old_grade_counts': {grade: int(count) for grade, count in zip(grades, matrix.sum(axis=1))},
+            'new_grade_counts': {grade: int(count) for grade, count in zip(grades, matrix.sum(axis=0))},
+            'transitions': {f"{old}->{new}": int(matrix[old - 1, new - 1])
+                            for old in grades for new in grades if old != new and matrix[old - 1, new - 1]},
+        }
+
+
+def rescore(manager, config, baseline=None, chunk_size=200000, write=True):
+    """Re-grade every stored face with `config` and return the diff report as a dict
+
+    The baseline is the grade stored with each result (which only describes
+    its largest face) or, when `baseline` is a config, that config applied to
+    the same landmarks.
+    """
+    report = DiffReport(config['version'], baseline['version'] if baseline else 'stored')
+    if baseline is None:
+        stored_ids, stored_grades = manager.stored_grades()
+
+    for chunk in manager.landmarks.iter_chunks(chunk_size):
+        landmarks = np.asarray(chunk['landmarks'], dtype=np.float64)
+        overall, grades = score_landmarks(landmarks, config)
+
+        if baseline is not None:
+            old_grades = score_landmarks(landmarks, baseline)[1]
+        else:
+            ids = np.asarray(chunk['ids'])
+            old_grades = np.zeros(len(ids), dtype=np.int64)
+            if len(stored_ids):
+                positions = np.minimum(np.searchsorted(stored_ids, ids), len(stored_ids) - 1)
+                primary = (stored_ids[positions] == ids) & (np.asarray(chunk['faces']) == 0)
+                old_grades[primary] = stored_grades[positions[primary]]
+        report.add(old_grades, grades)
+
+        if write:
+            manager.save_rescored(config['version'], chunk['ids'], chunk['faces'], overall, grades)
+
+    return report.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='analysis_results.db', help='ResultsManager database')
+    parser.add_argument('--config', required=True,
+                        help=f"preset ({', '.join(SCORING_PRESETS)}) or JSON scoring config")
+    parser.add_argument('--baseline', help='compare with this config instead of the stored grades')
+    parser.add_argument('--report', help='also write the diff report to this JSON file')
+    parser.add_argument('--dry-run', action='store_true', help='only report, do not store the new grades')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='faces scored per vectorized pass')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist")
+    try:
+        config = load_config(args.config)
+        baseline = load_config(args.baseline) if args.baseline else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    manager = ResultsManager(args.db, legacy_file=None)
+    start = time.perf_counter()
+    try:
+        report = rescore(manager, config, baseline, chunk_size=args.chunk_size, write=not args.dry_run)
+    finally:
+        manager.close()
+    report['seconds'] = round(time.perf_counter() - start, 3)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
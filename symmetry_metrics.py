@@ -0,0 +1,93 @@
+import numpy as np
+
+# 68-point landmark index groups (dlib / iBUG 300-W layout)
+JAW = slice(0, 17)
+LEFT_BROW = slice(17, 22)
+RIGHT_BROW = slice(22, 27)
+NOSE = slice(27, 36)
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+LEFT_MOUTH = [48, 49, 50, 58, 59, 60]
+RIGHT_MOUTH = [52, 53, 54, 55, 64, 65]
+
+
+def as_landmark_array(landmarks):
+    """Return landmarks as a float array of shape (N, 68, 2)
+
+    Accepts a single face as a list of 68 (x, y) tuples or a (68, 2) array,
+    or many faces as an (N, 68, 2) array.
+    """
+    points = np.asarray(landmarks, dtype=np.float64)
+    if points.ndim == 2:
+        points = points[np.newaxis]
+    if points.shape[1:] != (68, 2):
+        raise ValueError(f"Expected landmarks of shape (N, 68, 2), got {points.shape}")
+    return points
+
+
+def _distance(points, a, b):
+    return np.linalg.norm(points[:, a] - points[:, b], axis=-1)
+
+
+def _ratio_symmetry(left, right):
+    """1 for equal measurements, falling towards 0 as they diverge"""
+    return 1 - np.abs(left - right) / np.maximum(left, right)
+
+
+def _center_symmetry(points, left, right, face_center_x):
+    """Symmetry of two feature centers' horizontal distance to the face midline, in percent"""
+    left_dist = np.abs(points[:, left, 0].mean(axis=1) - face_center_x)
+    right_dist = np.abs(points[:, right, 0].mean(axis=1) - face_center_x)
+    return np.clip(100 * _ratio_symmetry(left_dist, right_dist), 0, 100)
+
+
+def compute_features(landmarks):
+    """Compute every eye, brow, mouth, nose and jaw asymmetry feature for N faces
+
+    Returns a dict of arrays of shape (N,). Ratio features are in [0, 1]
+    (1 = symmetric), `*_center_symmetry` features are percentages and the
+    remaining features are absolute pixel differences.
+    """
+    points = as_landmark_array(landmarks)
+    x = points[..., 0]
+    y = points[..., 1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        face_center_x = (x[:, 0] + x[:, 16]) / 2
+        face_width = np.abs(x[:, 16] - x[:, 0])
+
+        features = {
+            # Eyes
+            'eye_width_symmetry': _ratio_symmetry(_distance(points, 36, 39), _distance(points, 42, 45)),
+            'eye_closure_asymmetry': np.abs(_distance(points, 37, 41) - _distance(points, 43, 47)),
+            'eye_closure_symmetry': _ratio_symmetry(_distance(points, 37, 41), _distance(points, 43, 47)),
+            'eye_center_symmetry': _center_symmetry(points, LEFT_EYE, RIGHT_EYE, face_center_x),
+            'eye_inner_height_diff': np.abs(y[:, 39] - y[:, 42]),
+            'eye_outer_height_diff': np.abs(y[:, 36] - y[:, 45]),
+
+            # Brows
+            'brow_offset_symmetry': 1 - np.linalg.norm(points[:, LEFT_BROW].mean(axis=1) -
+                                                       points[:, RIGHT_BROW].mean(axis=1), axis=-1) / 100,
+            'brow_center_symmetry': _center_symmetry(points, LEFT_BROW, RIGHT_BROW, face_center_x),
+            'brow_inner_height_diff': np.abs(y[:, 21] - y[:, 22]),
+            'brow_outer_height_diff': np.abs(y[:, 17] - y[:, 26]),
+
+            # Mouth
+            'mouth_corner_symmetry': _ratio_symmetry(_distance(points, 48, 51), _distance(points, 54, 51)),
+            'mouth_horizontal_asymmetry': np.abs(np.abs(x[:, 48] - x[:, 51]) - np.abs(x[:, 54] - x[:, 51])),
+            'mouth_vertical_asymmetry': np.abs(y[:, 51] - y[:, 57]),
+            'mouth_center_symmetry': _center_symmetry(points, LEFT_MOUTH, RIGHT_MOUTH, face_center_x),
+            'mouth_corner_height_diff': np.abs(y[:, 48] - y[:, 54]),
+
+            # Nose
+            'nose_wing_height_diff': np.abs(y[:, 31] - y[:, 35]),
+            'nose_tip_deviation': np.abs(x[:, 30] - face_center_x) / face_width,
+
+            # Jaw
+            'jaw_symmetry': _ratio_symmetry(_distance(points, 0, 8), _distance(points, 16, 8)),
+
+            # Left half of the face mirrored onto the right half around point 16
+            'half_mirror_diff': np.abs(x[:, 0:34] - (2 * x[:, 16:17] - x[:, 34:68])).mean(axis=1),
+        }
+
+    return features
@@ -0,0 +1,41 @@
+import csv
+
+from build_dataset import DatasetWriter
+
+COLUMNS = ['image_path', 'status']
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_resume_after_interrupt_before_first_batch(tmp_path):
+    path = str(tmp_path / 'features.csv')
+    writer = DatasetWriter(path, COLUMNS)
+    # Interrupted mid-batch: rows reached the file but no checkpoint was written for them
+    writer._writer.writerow({'image_path': 'a.png', 'status': 'ok'})
+    writer.close()
+
+    writer = DatasetWriter(path, COLUMNS)
+    assert writer.state['next_index'] == 0
+    writer.write_batch([{'image_path': 'a.png', 'status': 'ok'}, {'image_path': 'b.png', 'status': 'no_face'}], 2)
+    writer.close()
+
+    assert [row['image_path'] for row in read_rows(path)] == ['a.png', 'b.png']
+
+
+def test_resume_truncates_the_interrupted_batch(tmp_path):
+    path = str(tmp_path / 'features.csv')
+    writer = DatasetWriter(path, COLUMNS)
+    writer.write_batch([{'image_path': 'a.png', 'status': 'ok'}], 1)
+    writer._writer.writerow({'image_path': 'b.png', 'status': 'ok'})
+    writer.close()
+
+    writer = DatasetWriter(path, COLUMNS)
+    assert writer.state['next_index'] == 1
+    writer.write_batch([{'image_path': 'b.png', 'status': 'ok'}], 2)
+    writer.close()
+
+    assert [row['image_path'] for row in read_rows(path)] == ['a.png', 'b.png']
+    assert writer.state['rows'] == 2
@@ -0,0 +1,28 @@
+import pytest
+
+from face_finder import FaceFinder, parse_face_boxes, parse_max_faces
+
+
+def test_parse_max_faces():
+    assert parse_max_faces(None) == 1
+    assert parse_max_faces('largest') == 1
+    assert parse_max_faces('all') is None
+    assert parse_max_faces('3') == 3
+    with pytest.raises(ValueError):
+        parse_max_faces('0')
+
+
+def test_parse_face_boxes_accepts_strings_and_lists():
+    assert parse_face_boxes(['1,2,30,40', [5.4, 6, 50, 60]]) == [[1, 2, 30, 40], [5, 6, 50, 60]]
+    assert parse_face_boxes([]) is None
+
+
+@pytest.mark.parametrize('values', [5, 'x', {'box': [1, 2, 3, 4]}, ['1,2,3'], [[10, 10, 5, 20]], [None]])
+def test_parse_face_boxes_rejects_invalid_input(values):
+    with pytest.raises(ValueError):
+        parse_face_boxes(values)
+
+
+def test_face_finder_needs_a_detector():
+    with pytest.raises(ValueError, match='detector'):
+        FaceFinder('shape_predictor_68_face_landmarks.dat')
@@ -0,0 +1,18 @@
+import base64
+
+import pytest
+
+from image_io import decode_base64
+
+
+def test_decode_base64_accepts_data_urls_and_line_breaks():
+    encoded = base64.b64encode(b'image bytes').decode()
+    assert decode_base64(encoded) == b'image bytes'
+    assert decode_base64(f"data:image/png;base64,{encoded}") == b'image bytes'
+    assert decode_base64(f"{encoded[:8]}\n{encoded[8:]}") == b'image bytes'
+
+
+@pytest.mark.parametrize('data', ['@@@', 'abc', 'aGVsbG8=!', 123, ['aGVsbG8='], None])
+def test_decode_base64_rejects_malformed_input(data):
+    with pytest.raises(ValueError):
+        decode_base64(data)
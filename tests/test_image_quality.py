@@ -0,0 +1,54 @@
+import numpy as np
+
+from image_quality import QualityGate
+
+
+def face_on_backdrop(backdrop=255, size=(800, 800), face=(300, 300, 500, 520)):
+    """A textured mid-gray 'face' pasted on a flat backdrop"""
+    image = np.full(size + (3,), backdrop, np.uint8)
+    left, top, right, bottom = face
+    texture = np.random.default_rng(0).integers(60, 200, size=(bottom - top, right - left, 1), dtype=np.uint8)
+    image[top:bottom, left:right] = texture
+    return image
+
+
+def checks(report):
+    return [issue['check'] for issue in report['issues']]
+
+
+def test_white_backdrop_is_not_judged_as_the_face():
+    gate = QualityGate(mode='reject')
+    image = face_on_backdrop(face=(100, 100, 250, 260))
+
+    report = gate.assess(image)
+    assert {'overexposed', 'clipped'} & set(checks(report))
+    assert not gate.rejected(report)
+
+    report = gate.assess(image, (100, 100, 250, 260))
+    assert report['passed']
+    assert report['measurements']['face_size'] == 150
+
+
+def test_exposure_and_size_inside_the_face_box_reject():
+    gate = QualityGate(mode='reject')
+    dark = face_on_backdrop() // 8
+
+    report = gate.assess(dark, (300, 300, 500, 520))
+    assert 'underexposed' in checks(report)
+    assert gate.rejected(report)
+
+    report = gate.assess(face_on_backdrop(), (300, 300, 340, 340))
+    assert checks(report) == ['too_small']
+    assert gate.rejected(report)
+
+
+def test_assess_faces_uses_the_largest_box():
+    report = QualityGate().assess_faces(face_on_backdrop(), [[0, 0, 10, 10], [300, 300, 500, 520]])
+    assert report['face_box'] == [300, 300, 500, 520]
+
+
+def test_flag_mode_is_the_default_and_never_rejects():
+    gate = QualityGate()
+    report = gate.assess(face_on_backdrop() // 8, (300, 300, 500, 520))
+    assert not report['passed']
+    assert not gate.rejected(report)
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError, RetryLater
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {queue.get(job_id)}")
+
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / 'jobs.db')
+
+
+def test_each_job_is_claimed_by_exactly_one_worker(database):
+    calls = []
+    lock = threading.Lock()
+
+    def handler(payload, options):
+        with lock:
+            calls.append(payload)
+        time.sleep(0.01)
+        return {'payload': payload.decode()}
+
+    queue = JobQueue(handler, database=database, workers=4)
+    try:
+        job_ids = [queue.submit(str(i).encode()) for i in range(20)]
+        for i, job_id in enumerate(job_ids):
+            assert wait_for(queue, job_id)['result'] == {'payload': str(i)}
+    finally:
+        queue.shutdown()
+    assert sorted(calls) == sorted(str(i).encode() for i in range(20))
+
+
+def test_claim_hands_a_job_to_one_connection(database):
+    queue = JobQueue(lambda payload, options: None, database=database, workers=0)
+    queue.submit(b'image')
+    with closing(queue._connect()) as first, closing(queue._connect()) as second:
+        claimed = [queue._claim(first), queue._claim(second)]
+    assert sum(row is not None for row in claimed) == 1
+    assert queue.stats() == {'running': 1}
+
+
+def test_retry_later_requeues_the_job(database):
+    attempts = []
+
+    def handler(payload, options):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise RetryLater()
+        return {'attempts': len(attempts)}
+
+    queue = JobQueue(handler, database=database, workers=1)
+    try:
+        job = wait_for(queue, queue.submit(b'image'))
+    finally:
+        queue.shutdown()
+    assert job['status'] == 'done'
+    assert job['result'] == {'attempts': 2}
+
+
+def test_failed_job_records_the_error(database):
+    def handler(payload, options):
+        raise ValueError('bad image')
+
+    queue = JobQueue(handler, database=database, workers=1)
+    try:
+        job = wait_for(queue, queue.submit(b'image'))
+    finally:
+        queue.shutdown()
+    assert job['status'] == 'failed'
+    assert job['error'] == 'bad image'
+
+
+def test_running_job_is_retried_after_restart(database):
+    crashed = JobQueue(lambda payload, options: None, database=database, workers=0)
+    job_id = crashed.submit(b'image', {'visualize': False})
+    with closing(crashed._connect()) as connection:
+        assert crashed._claim(connection)['id'] == job_id
+
+    queue = JobQueue(lambda payload, options: {'options': options}, database=database, workers=1)
+    try:
+        job = wait_for(queue, job_id)
+    finally:
+        queue.shutdown()
+    assert job['result'] == {'options': {'visualize': False}}
+
+
+def test_submit_refuses_jobs_beyond_max_pending(database):
+    queue = JobQueue(lambda payload, options: None, database=database, workers=0, max_pending=1)
+    queue.submit(b'image')
+    with pytest.raises(QueueFullError):
+        queue.submit(b'image')
+
+
+def test_worker_survives_database_errors(database, monkeypatch, capsys):
+    queue = JobQueue(lambda payload, options: {'ok': True}, database=database, workers=0)
+    claim = queue._claim
+    failures = []
+
+    def flaky_claim(connection):
+        if not failures:
+            failures.append(True)
+            raise sqlite3.OperationalError('database is locked')
+        return claim(connection)
+
+    monkeypatch.setattr(queue, '_claim', flaky_claim)
+    job_id = queue.submit(b'image')
+    worker = threading.Thread(target=queue._work, daemon=True)
+    worker.start()
+    try:
+        assert wait_for(queue, job_id)['result'] == {'ok': True}
+    finally:
+        queue._stopping = True
+        worker.join()
+    assert 'database is locked' in capsys.readouterr().out
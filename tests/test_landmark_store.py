@@ -0,0 +1,31 @@
+import numpy as np
+
+from landmark_store import LandmarkStore
+
+
+def faces(count, offset=0):
+    return np.arange(count * 68 * 2).reshape(count, 68, 2) + offset
+
+
+def test_reopen_drops_partially_written_tail(tmp_path):
+    store = LandmarkStore(str(tmp_path))
+    store.append(faces(2), record_id=1, model_version='v1')
+
+    # A crash mid-append leaves bytes in the columns written before ids.bin
+    for column in ('landmarks', 'faces', 'timestamps', 'models'):
+        with open(store._file(column), 'ab') as f:
+            f.write(b'\x01' * 7)
+
+    store = LandmarkStore(str(tmp_path))
+    assert len(store) == 2
+    arrays = store.arrays()
+    np.testing.assert_array_equal(arrays['landmarks'], faces(2))
+    np.testing.assert_array_equal(arrays['ids'], [1, 1])
+
+    store.append(faces(1, offset=5), record_id=2, model_version='v2')
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.get(1), faces(2))
+    np.testing.assert_array_equal(store.get(2), faces(1, offset=5))
+    arrays = store.arrays()
+    np.testing.assert_array_equal(arrays['faces'], [0, 1, 0])
+    assert [store.model_versions()[index] for index in arrays['models']] == ['v1', 'v1', 'v2']
@@ -0,0 +1,32 @@
+import pytest
+
+from model_registry import ModelRegistry
+
+
+def missing_model():
+    raise FileNotFoundError('model file not found')
+
+
+def test_failed_load_is_reported_instead_of_warming_up():
+    registry = ModelRegistry()
+    registry.warm_up(lambda: registry.get('broken', missing_model), background=False)
+
+    status = registry.status()
+    assert status['state'] == 'failed'
+    assert not status['ready']
+    assert status['models']['broken'] == {'state': 'failed', 'error': 'model file not found'}
+    assert status['errors'] == ['model file not found']
+
+
+def test_warm_up_failure_outside_get_is_reported():
+    registry = ModelRegistry()
+    registry.warm_up(missing_model, background=False)
+    assert registry.state() == 'failed'
+    assert registry.errors() == ['model file not found']
+
+
+def test_loaded_models_are_ready():
+    registry = ModelRegistry()
+    registry.warm_up(lambda: registry.get('model', object), background=False)
+    assert registry.status() == {'state': 'ready', 'ready': True,
+                                 'models': {'model': {'state': 'ready', 'load_seconds': pytest.approx(0, abs=1)}}}
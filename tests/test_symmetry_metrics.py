@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from scipy.spatial import distance
+
+from symmetry_metrics import as_landmark_array, compute_features
+
+
+# Per-face reference formulas, as the analyzers computed them before compute_features replaced them
+
+def reference_features(landmarks):
+    def center_symmetry(left_points, right_points):
+        left_center = np.mean([landmarks[i] for i in left_points], axis=0)
+        right_center = np.mean([landmarks[i] for i in right_points], axis=0)
+        face_center_x = (landmarks[0][0] + landmarks[16][0]) / 2
+        left_dist = abs(left_center[0] - face_center_x)
+        right_dist = abs(right_center[0] - face_center_x)
+        symmetry = 100 * (1 - abs(left_dist - right_dist) / max(left_dist, right_dist))
+        return max(0, min(100, symmetry))
+
+    left_eye_height = distance.euclidean(landmarks[37], landmarks[41])
+    right_eye_height = distance.euclidean(landmarks[43], landmarks[47])
+    left_eye_width = distance.euclidean(landmarks[36], landmarks[39])
+    right_eye_width = distance.euclidean(landmarks[42], landmarks[45])
+    mouth_left_dist = distance.euclidean(landmarks[48], landmarks[51])
+    mouth_right_dist = distance.euclidean(landmarks[54], landmarks[51])
+    left_brow_avg = np.mean([landmarks[i] for i in range(17, 22)], axis=0)
+    right_brow_avg = np.mean([landmarks[i] for i in range(22, 27)], axis=0)
+
+    total_diff = 0
+    for i in range(34):
+        total_diff += abs(landmarks[i][0] - (landmarks[16][0] * 2 - landmarks[34 + i][0]))
+
+    return {
+        'eye_width_symmetry': 1 - abs(left_eye_width - right_eye_width) / max(left_eye_width, right_eye_width),
+        'mouth_corner_symmetry': 1 - abs(mouth_left_dist - mouth_right_dist) / max(mouth_left_dist, mouth_right_dist),
+        'brow_offset_symmetry': 1 - distance.euclidean(left_brow_avg, right_brow_avg) / 100,
+        'mouth_horizontal_asymmetry': abs(abs(landmarks[48][0] - landmarks[51][0]) -
+                                          abs(landmarks[54][0] - landmarks[51][0])),
+        'mouth_vertical_asymmetry': abs(landmarks[51][1] - landmarks[57][1]),
+        'eye_closure_asymmetry': abs(left_eye_height - right_eye_height),
+        'eye_closure_symmetry': min(left_eye_height, right_eye_height) / max(left_eye_height, right_eye_height),
+        'eye_center_symmetry': center_symmetry(range(36, 42), range(42, 48)),
+        'brow_center_symmetry': center_symmetry(range(17, 22), range(22, 27)),
+        'mouth_center_symmetry': center_symmetry([48, 49, 50, 58, 59, 60], [52, 53, 54, 55, 64, 65]),
+        'half_mirror_diff': total_diff / 34,
+        'brow_inner_height_diff': abs(landmarks[21][1] - landmarks[22][1]),
+        'brow_outer_height_diff': abs(landmarks[17][1] - landmarks[26][1]),
+        'eye_inner_height_diff': abs(landmarks[39][1] - landmarks[42][1]),
+        'eye_outer_height_diff': abs(landmarks[36][1] - landmarks[45][1]),
+        'nose_wing_height_diff': abs(landmarks[35][1] - landmarks[31][1]),
+        'mouth_corner_height_diff': abs(landmarks[54][1] - landmarks[48][1]),
+    }
+
+
+def test_compute_features_matches_per_face_reference():
+    rng = np.random.default_rng(0)
+    faces = rng.uniform(0, 500, size=(2000, 68, 2))
+
+    features = compute_features(faces)
+
+    for index, face in enumerate(faces):
+        landmarks = [tuple(point) for point in face]
+        for name, expected in reference_features(landmarks).items():
+            assert features[name][index] == pytest.approx(expected, rel=1e-9, abs=1e-9), (name, index)
+
+
+def test_compute_features_accepts_a_single_face():
+    face = np.random.default_rng(1).integers(0, 500, size=(68, 2))
+
+    single = compute_features([tuple(point) for point in face])
+    batch = compute_features(face[np.newaxis])
+
+    for name in batch:
+        assert single[name].shape == (1,)
+        assert single[name][0] == batch[name][0]
+
+
+def test_as_landmark_array_rejects_wrong_shape():
+    with pytest.raises(ValueError):
+        as_landmark_array(np.zeros((5, 2)))
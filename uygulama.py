@@ -2,11 +2,27 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import cv2
-import dlib
 import numpy as np
 import json
+import queue
+import threading
 from datetime import datetime
+from functools import partial
 import os
+from symmetry_metrics import compute_features
+from model_registry import get_frontal_face_detector, get_shape_predictor, registry
+from face_detectors import DlibHOGDetector
+from face_finder import FaceFinder
+
+PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+# How often the Tk thread checks for progress from the analysis thread
+POLL_MS = 50
+# Bounding box of the image previews
+DISPLAY_SIZE = (500, 500)
+
+class AnalysisCancelled(Exception):
+    """Raised on the worker thread when the user cancels the running analysis"""
 
 class FacialParalysisDetector:
     def __init__(self, root):
@@ -15,14 +31,23 @@ class FacialParalysisDetector:
         self.root.geometry("1400x900")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize detector
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+        # Load the detector and predictor in the background so the window appears immediately
+        registry.warm_up(get_frontal_face_detector, partial(get_shape_predictor, PREDICTOR_PATH))
+        # Landmarks are predicted on a padded grayscale crop of the face, as in the web and API apps
+        self.face_finder = FaceFinder(PREDICTOR_PATH, DlibHOGDetector())
         
         self.current_image_path = None
         self.analysis_results = None
+        self.folder_results = []
+        
+        # Analyses run on a worker thread that reports back through this queue;
+        # Tk widgets are only touched from the main thread in poll_events()
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
         
         self.setup_ui()
+        self.root.after(POLL_MS, self.poll_model_status)
     
     def setup_ui(self):
         # Main title
@@ -57,6 +82,23 @@ class FacialParalysisDetector:
                                     state=tk.DISABLED)
         self.analyze_btn.pack(pady=5)
         
+        # Folder button - analyzes every image in a directory one after another
+        self.folder_btn = tk.Button(left_frame, text="📂 Analyze Folder", 
+                                   command=self.analyze_folder, bg='#8e44ad', fg='white',
+                                   font=('Arial', 12, 'bold'), padx=20, pady=10)
+        self.folder_btn.pack(pady=5)
+        
+        # Progress of the running analysis
+        self.progress = ttk.Progressbar(left_frame, mode='determinate', length=300)
+        self.progress.pack(pady=5)
+        
+        self.status_label = tk.Label(left_frame, text="Loading models...", bg='#f0f0f0', font=('Arial', 10))
+        self.status_label.pack()
+        
+        self.cancel_btn = tk.Button(left_frame, text="✖ Cancel", command=self.cancel_analysis,
+                                   font=('Arial', 10), state=tk.DISABLED)
+        self.cancel_btn.pack(pady=5)
+        
         # Right panel - Results display
         right_frame = tk.LabelFrame(main_container, text="Analysis Results", 
                                    font=('Arial', 12, 'bold'), bg='#f0f0f0', padx=10, pady=10)
@@ -102,6 +144,11 @@ class FacialParalysisDetector:
         self.visualization_label = tk.Label(visualization_frame, text="Visualization will appear here", 
                                            bg='white', relief=tk.SUNKEN, width=60, height=20)
         self.visualization_label.pack(pady=10)
+        
+        # The annotated image is kept in memory and only written to disk on request
+        self.export_btn = tk.Button(visualization_frame, text="💾 Export Result", command=self.export_result,
+                                   font=('Arial', 11), state=tk.DISABLED)
+        self.export_btn.pack(pady=5)
     
     def upload_image(self):
         file_path = filedialog.askopenfilename(
@@ -117,50 +164,170 @@ class FacialParalysisDetector:
     
     def display_image(self, image_path):
         image = Image.open(image_path)
-        image.thumbnail((500, 500))
+        # JPEGs decode straight at a reduced scale (1/2 to 1/8) close to the preview size
+        image.draft('RGB', DISPLAY_SIZE)
+        image.thumbnail(DISPLAY_SIZE)
         photo = ImageTk.PhotoImage(image)
         self.image_display.config(image=photo, text="")
         self.image_display.image = photo
     
+    def poll_model_status(self):
+        # Show when the background model load has finished, unless an analysis owns the status line
+        if self.worker is not None:
+            return
+        state = registry.state()
+        if state == 'ready':
+            self.status_label.config(text="Ready")
+        elif state == 'failed':
+            self.status_label.config(text=f"Model loading failed: {'; '.join(registry.errors())}")
+        else:
+            self.root.after(POLL_MS * 4, self.poll_model_status)
+    
     def analyze_image(self):
         if not self.current_image_path:
             messagebox.showerror("Error", "Please upload an image first!")
             return
         
-        try:
-            # Perform analysis
-            results = self.perform_analysis()
-            self.analysis_results = results
-            
-            # Display results in tabs
-            self.display_numerical_scores(results)
-            self.display_classification(results)
-            self.display_visualization(results)
-            
-            messagebox.showinfo("Analysis Complete", "Facial paralysis analysis completed successfully!")
+        self.start_analysis([self.current_image_path])
+    
+    def analyze_folder(self):
+        folder = filedialog.askdirectory(title="Select Folder of Patient Images")
+        if not folder:
+            return
+        
+        paths = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not paths:
+            messagebox.showerror("Error", "No images found in the selected folder!")
+            return
+        
+        self.start_analysis(paths)
+    
+    def start_analysis(self, paths):
+        """Analyze `paths` in order on a worker thread, keeping the window responsive"""
+        if self.worker is not None:
+            return
+        
+        self.folder_results = []
+        self.cancel_event.clear()
+        self.progress.config(maximum=len(paths), value=0)
+        self.analyze_btn.config(state=tk.DISABLED)
+        self.folder_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        
+        self.worker = threading.Thread(target=self.run_analyses, args=(paths,), daemon=True)
+        self.worker.start()
+        self.root.after(POLL_MS, self.poll_events)
+    
+    def cancel_analysis(self):
+        # Takes effect between analysis steps; a running dlib call finishes first
+        self.cancel_event.set()
+        self.status_label.config(text="Cancelling...")
+        self.cancel_btn.config(state=tk.DISABLED)
+    
+    def run_analyses(self, paths):
+        """Worker thread: analyze each image and post events for the Tk thread"""
+        for index, path in enumerate(paths):
+            if self.cancel_event.is_set():
+                break
+            self.events.put(('progress', index, path, len(paths)))
+            try:
+                results = self.perform_analysis(path)
+            except AnalysisCancelled:
+                break
+            except Exception as e:
+                self.events.put(('error', index, path, str(e)))
+            else:
+                self.events.put(('result', index, path, results))
+        self.events.put(('done', None, None, len(paths)))
+    
+    def poll_events(self):
+        """Apply the worker's progress to the UI; runs on the Tk thread through root.after"""
+        while True:
+            try:
+                kind, index, path, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
             
-        except Exception as e:
-            messagebox.showerror("Analysis Error", f"Error during analysis: {str(e)}")
+            if kind == 'progress':
+                waiting = "" if registry.is_ready() else " (loading models)"
+                self.status_label.config(
+                    text=f"Analyzing {index + 1}/{payload}: {os.path.basename(path)}{waiting}")
+            elif kind == 'result':
+                self.progress.config(value=index + 1)
+                self.show_results(path, payload)
+            elif kind == 'error':
+                self.progress.config(value=index + 1)
+                self.folder_results.append((path, None, payload))
+            elif kind == 'done':
+                self.finish_analysis(payload)
+                return
+        
+        self.root.after(POLL_MS, self.poll_events)
     
-    def perform_analysis(self):
-        # Load image
-        image = cv2.imread(self.current_image_path)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    def show_results(self, path, results):
+        self.analysis_results = results
+        # Only the latest annotated image is kept in memory for display and export
+        summary = {key: value for key, value in results.items() if key != 'visualization'}
+        self.folder_results.append((path, summary, None))
+        
+        # Display results in tabs
+        self.display_numerical_scores(results)
+        self.display_classification(results)
+        self.display_visualization(results)
+    
+    def finish_analysis(self, total):
+        self.worker = None
+        self.analyze_btn.config(state=tk.NORMAL if self.current_image_path else tk.DISABLED)
+        self.folder_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        
+        done = len(self.folder_results)
+        failed = [(path, error) for path, _, error in self.folder_results if error]
+        if self.cancel_event.is_set():
+            self.status_label.config(text=f"Cancelled after {done}/{total} images")
+            return
+        self.status_label.config(text=f"Analyzed {done - len(failed)}/{total} images")
         
-        # Detect face
-        faces = self.detector(gray)
-        if len(faces) == 0:
+        if total == 1:
+            if failed:
+                messagebox.showerror("Analysis Error", f"Error during analysis: {failed[0][1]}")
+            else:
+                messagebox.showinfo("Analysis Complete", "Facial paralysis analysis completed successfully!")
+        else:
+            self.display_folder_summary()
+    
+    def display_folder_summary(self):
+        lines = ["=== FOLDER ANALYSIS ===", ""]
+        for path, results, error in self.folder_results:
+            if error:
+                lines.append(f"{os.path.basename(path)}: failed - {error}")
+            else:
+                lines.append(f"{os.path.basename(path)}: Grade {results['house_brackmann']['grade']}/6, "
+                             f"overall symmetry {results['symmetry_scores']['overall_symmetry']}%")
+        self.classification_text.delete(1.0, tk.END)
+        self.classification_text.insert(1.0, "\n".join(lines))
+        self.notebook.select(self.classification_tab)
+    
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise AnalysisCancelled()
+    
+    def perform_analysis(self, image_path):
+        """Analyze one image; runs on the worker thread and must not touch Tk widgets"""
+        # Load image
+        image = cv2.imread(image_path)
+        if image is None:
+            raise Exception("Could not read the image")
+        self.check_cancelled()
+        
+        # Detect the largest face and predict its landmarks
+        faces = self.face_finder.find_faces(image, max_faces=1)
+        if not faces:
             raise Exception("No face detected in the image")
+        self.check_cancelled()
         
-        face = faces[0]
-        landmarks = self.predictor(gray, face)
-        
-        # Extract landmarks
-        landmarks_points = []
-        for n in range(68):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            landmarks_points.append((x, y))
+        _, landmarks_points = faces[0]
         
         # Calculate symmetry scores
         symmetry_scores = self.calculate_symmetry_scores(landmarks_points)
@@ -169,7 +336,7 @@ class FacialParalysisDetector:
         hb_grade, hb_classification = self.calculate_house_brackmann(symmetry_scores)
         
         # Create visualization
-        visualization_path = self.create_visualization(image.copy(), landmarks_points, symmetry_scores, hb_grade)
+        visualization = self.create_visualization(image, landmarks_points, symmetry_scores, hb_grade)
         
         return {
             'symmetry_scores': symmetry_scores,
@@ -177,35 +344,16 @@ class FacialParalysisDetector:
                 'grade': hb_grade,
                 'classification': hb_classification
             },
-            'visualization_path': visualization_path,
+            'visualization': visualization,
             'timestamp': datetime.now().isoformat()
         }
     
     def calculate_symmetry_scores(self, landmarks):
-        # Calculate various symmetry metrics
-        def calculate_feature_symmetry(left_points, right_points):
-            left_center = np.mean([landmarks[i] for i in left_points], axis=0)
-            right_center = np.mean([landmarks[i] for i in right_points], axis=0)
-            
-            # Calculate horizontal symmetry
-            face_center_x = (landmarks[0][0] + landmarks[16][0]) / 2
-            left_dist = abs(left_center[0] - face_center_x)
-            right_dist = abs(right_center[0] - face_center_x)
-            
-            symmetry = 100 * (1 - abs(left_dist - right_dist) / max(left_dist, right_dist))
-            return max(0, min(100, symmetry))
-        
-        # Define facial feature points
-        left_eye = list(range(36, 42))
-        right_eye = list(range(42, 48))
-        left_brow = list(range(17, 22))
-        right_brow = list(range(22, 27))
-        left_mouth = [48, 49, 50, 58, 59, 60]
-        right_mouth = [52, 53, 54, 55, 64, 65]
-        
-        eye_symmetry = calculate_feature_symmetry(left_eye, right_eye)
-        brow_symmetry = calculate_feature_symmetry(left_brow, right_brow)
-        mouth_symmetry = calculate_feature_symmetry(left_mouth, right_mouth)
+        # Feature centers' distance to the face midline, left vs right
+        features = compute_features(landmarks)
+        eye_symmetry = float(features['eye_center_symmetry'][0])
+        brow_symmetry = float(features['brow_center_symmetry'][0])
+        mouth_symmetry = float(features['mouth_center_symmetry'][0])
         
         overall_symmetry = (eye_symmetry + brow_symmetry + mouth_symmetry) / 3
         
@@ -260,10 +408,7 @@ class FacialParalysisDetector:
             cv2.putText(image, text, (10, y_offset + i * line_height), 
                        font, 0.5, (0, 0, 0), 1)
         
-        # Save visualization
-        output_path = f"analysis_result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        cv2.imwrite(output_path, image)
-        return output_path
+        return image
     
     def display_numerical_scores(self, results):
         self.scores_text.delete(1.0, tk.END)
@@ -323,12 +468,39 @@ for proper diagnosis and treatment planning.
         self.classification_text.insert(1.0, classification_text)
     
     def display_visualization(self, results):
-        # Display the analyzed image with landmarks
-        image = Image.open(results['visualization_path'])
-        image.thumbnail((500, 500))
-        photo = ImageTk.PhotoImage(image)
+        # Display the analyzed image with landmarks straight from memory
+        photo = self.to_photo_image(results['visualization'])
         self.visualization_label.config(image=photo, text="")
         self.visualization_label.image = photo
+        self.export_btn.config(state=tk.NORMAL)
+    
+    @staticmethod
+    def to_photo_image(image, size=DISPLAY_SIZE):
+        """Convert a BGR ndarray to a PhotoImage, scaled down to fit `size` before any conversion"""
+        height, width = image.shape[:2]
+        scale = min(1.0, size[0] / width, size[1] / height)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+    
+    def export_result(self):
+        if not self.analysis_results:
+            return
+        
+        output_path = filedialog.asksaveasfilename(
+            title="Export Analysis Result",
+            initialfile=f"analysis_result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+            defaultextension=".png",
+            filetypes=[("PNG image", "*.png"), ("JPEG image", "*.jpg *.jpeg")]
+        )
+        if not output_path:
+            return
+        
+        if cv2.imwrite(output_path, self.analysis_results['visualization']):
+            messagebox.showinfo("Export", f"Analysis result saved to {output_path}")
+        else:
+            messagebox.showerror("Export Error", f"Could not write {output_path}")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,230 @@
+"""Streaming facial movement analysis for video files and webcams
+
+    python video_analysis.py --source 0 --exercise smile
+    python video_analysis.py --source session.mp4 --schedule rest:0-3,eye_closure:3-8,smile:8-13,brow_raise:13-18
+"""
+import argparse
+import json
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+from facial_landmarks import EnhancedFacialParalysisAnalyzer
+from landmark_smoothing import OneEuroFilter
+
+# Movement metrics tracked for the per-exercise peak summary
+MOVEMENT_METRICS = ('mouth_horizontal_asymmetry', 'mouth_vertical_asymmetry',
+                    'eye_closure_asymmetry', 'brow_height_asymmetry')
+
+
+def iter_frames(source):
+    """Yield (frame_index, timestamp_seconds, frame) from a video file or webcam index"""
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video source {source}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            success, frame = capture.read()
+            if not success:
+                break
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000 or index / fps
+            yield index, timestamp, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def parse_schedule(text):
+    """Parse 'smile:0-5,eye_closure:5-10' into [(name, start, end), ...]"""
+    schedule = []
+    for item in filter(None, text.split(',')):
+        name, span = item.split(':')
+        start, end = span.split('-')
+        schedule.append((name, float(start), float(end)))
+    return schedule
+
+
+def exercise_at(timestamp, default=None, schedule=None):
+    for name, start, end in schedule or []:
+        if start <= timestamp < end:
+            return name
+    return default
+
+
+class VideoParalysisAnalyzer:
+    def __init__(self, analyzer, detect_every=30, min_confidence=7.0, smoother=None, keep_landmarks=False):
+        """Track the face box between detector runs and smooth the landmarks over time
+
+        Each frame's landmarks are predicted in the box tracked from the
+        previous frame. The detector only runs again when the tracker's
+        confidence (peak-to-sidelobe ratio) drops below `min_confidence`,
+        the face was lost, or `detect_every` frames have passed. `smoother`
+        is a landmark filter such as OneEuroFilter; None disables smoothing.
+        Frame results hold the scores only; `keep_landmarks` adds each frame's
+        68 points, e.g. for drawing them.
+        """
+        self.analyzer = analyzer
+        self.detect_every = max(1, detect_every)
+        self.min_confidence = min_confidence
+        self.smoother = smoother
+        self.keep_landmarks = keep_landmarks
+        self.tracker = dlib.correlation_tracker()
+        self.tracking = False
+        self.frames_since_detection = 0
+        self.detections = 0
+
+    def locate_face(self, gray):
+        """Return (face rectangle or None, tracking confidence or None if the detector ran)"""
+        if self.tracking and self.frames_since_detection + 1 < self.detect_every:
+            confidence = self.tracker.update(gray)
+            if confidence >= self.min_confidence:
+                self.frames_since_detection += 1
+                position = self.tracker.get_position()
+                return dlib.rectangle(int(position.left()), int(position.top()),
+                                      int(position.right()), int(position.bottom())), confidence
+
+        self.detections += 1
+        self.frames_since_detection = 0
+        faces = self.analyzer.detect_faces(gray)
+        if len(faces) == 0:
+            self.tracking = False
+            return None, None
+
+        face = max(faces, key=lambda rect: rect.area())
+        self.tracker.start_track(gray, face)
+        self.tracking = True
+        return face, None
+
+    def analyze_frame(self, index, timestamp, frame, exercise=None):
+        """Movement metrics and grade of the tracked face in a single frame"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        face, confidence = self.locate_face(gray)
+        result = {'frame': index, 'time': round(timestamp, 3), 'exercise': exercise, 'face_found': face is not None,
+                  'detected': confidence is None}
+        if face is None:
+            if self.smoother is not None:
+                self.smoother.reset()
+            return result
+
+        shape = self.analyzer.predictor(gray, face)
+        landmarks = np.array([(shape.part(i).x, shape.part(i).y) for i in range(68)])
+        if self.smoother is not None:
+            landmarks = self.smoother(landmarks, timestamp)
+        symmetry_scores = self.analyzer.calculate_symmetry_score(landmarks)
+
+        if self.keep_landmarks:
+            result['landmarks'] = landmarks
+        result['movement'] = self.analyzer.analyze_facial_movement(frame, landmarks)
+        result['symmetry_scores'] = symmetry_scores
+        result['house_brackmann_grade'] = self.analyzer.calculate_house_brackmann_score(symmetry_scores, landmarks)[0]
+        if confidence is not None:
+            result['tracking_confidence'] = round(confidence, 2)
+        return result
+
+    def analyze_stream(self, frames, exercise=None, schedule=None):
+        """Yield one result per (index, timestamp, frame) from `frames`
+
+        Frames are labelled with `exercise`, or with the schedule entry whose
+        time range contains the frame timestamp.
+        """
+        for index, timestamp, frame in frames:
+            yield self.analyze_frame(index, timestamp, frame, exercise_at(timestamp, exercise, schedule))
+
+    def summarize(self, frame_results):
+        """Peak asymmetry per exercise, with the frame and time where it occurred
+
+        `grade_changes` counts frame-to-frame House-Brackmann grade switches,
+        a measure of how much the grade flickers.
+        """
+        summary = {}
+        previous_grades = {}
+        for result in frame_results:
+            label = result['exercise'] or 'unlabelled'
+            entry = summary.setdefault(label, {
+                'frames': 0,
+                'frames_with_face': 0,
+                'grade_changes': 0,
+                'peaks': {metric: {'value': None, 'frame': None, 'time': None} for metric in MOVEMENT_METRICS}
+            })
+            entry['frames'] += 1
+            if not result['face_found']:
+                continue
+
+            entry['frames_with_face'] += 1
+            grade = result['house_brackmann_grade']
+            if previous_grades.get(label, grade) != grade:
+                entry['grade_changes'] += 1
+            previous_grades[label] = grade
+            for metric in MOVEMENT_METRICS:
+                value = result['movement'][metric]
+                peak = entry['peaks'][metric]
+                if peak['value'] is None or value > peak['value']:
+                    peak.update({'value': value, 'frame': result['frame'], 'time': result['time']})
+        return summary
+
+
+def draw_landmarks(frame, result):
+    for (x, y) in result.get('landmarks', []):
+        cv2.circle(frame, (int(x), int(y)), 1, (0, 255, 0), -1)
+    if result['exercise']:
+        cv2.putText(frame, result['exercise'], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Facial movement analysis on video or webcam")
+    parser.add_argument('--source', default='0', help='video file path or webcam index')
+    parser.add_argument('--shape-predictor', default='shape_predictor_68_face_landmarks.dat')
+    parser.add_argument('--detect-every', type=int, default=30, help='run the face detector at least every k frames')
+    parser.add_argument('--min-confidence', type=float, default=7.0,
+                        help='re-detect when the tracking confidence drops below this')
+    parser.add_argument('--min-cutoff', type=float, default=1.0, help='One-Euro filter cutoff in Hz')
+    parser.add_argument('--beta', type=float, default=0.05, help='One-Euro filter speed coefficient')
+    parser.add_argument('--no-smoothing', action='store_true', help='use the raw per-frame landmarks')
+    parser.add_argument('--detection-width', type=int, default=480, help='downscaled width for face detection')
+    parser.add_argument('--exercise', help='label for the whole recording (e.g. smile)')
+    parser.add_argument('--schedule', default='', help='name:start-end seconds, comma separated')
+    parser.add_argument('--max-frames', type=int, default=0)
+    parser.add_argument('--display', action='store_true', help='show the annotated stream')
+    args = parser.parse_args()
+
+    analyzer = EnhancedFacialParalysisAnalyzer(args.shape_predictor, detection_width=args.detection_width)
+    smoother = None if args.no_smoothing else OneEuroFilter(min_cutoff=args.min_cutoff, beta=args.beta)
+    video = VideoParalysisAnalyzer(analyzer, detect_every=args.detect_every, min_confidence=args.min_confidence,
+                                   smoother=smoother, keep_landmarks=args.display)
+
+    schedule = parse_schedule(args.schedule)
+    results = []
+    start = time.perf_counter()
+    for index, timestamp, frame in iter_frames(args.source):
+        frame_result = video.analyze_frame(index, timestamp, frame, exercise_at(timestamp, args.exercise, schedule))
+        if args.display:
+            draw_landmarks(frame, frame_result)
+            # The landmarks are only kept for drawing; the summary needs the scores alone
+            frame_result.pop('landmarks', None)
+        results.append(frame_result)
+        if args.display:
+            cv2.imshow("Facial Movement", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+        if args.max_frames and len(results) >= args.max_frames:
+            break
+    elapsed = time.perf_counter() - start
+
+    if args.display:
+        cv2.destroyAllWindows()
+
+    print(json.dumps({
+        'frames': len(results),
+        'fps': round(len(results) / elapsed, 1) if elapsed else None,
+        'detector_runs': video.detections,
+        'exercises': video.summarize(results)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,61 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 import cv2
 import numpy as np
 import base64
+import json
 import os
+import time
 from datetime import datetime
+from functools import partial
+from image_io import decode_image, encode_preview, fit_width, preview_settings_from_env, upload_settings_from_env
+from worker_pool import PoolBusyError, pool_from_env
+from symmetry_metrics import compute_features
+from landmark_cache import cache_from_env
+from face_detectors import OpenCVHaarDetector, detector_from_env
+from face_finder import FaceFinder, parse_face_boxes, parse_max_faces
+from model_registry import get_shape_predictor, registry
+from job_queue import InvalidCallbackError, LazyJobQueue, QueueFullError, job_queue_from_env
+from artifact_store import artifact_store_from_env
+from image_quality import quality_gate_from_env
+from metrics import image_info, instrument_app, metrics, record_stage
 
 app = Flask(__name__)
+# Request latency histograms and the per-stage analysis metrics are served at /metrics
+instrument_app(app)
+# Larger request bodies are refused with 413 before they are read; the page downscales photos to fit
+upload_settings = upload_settings_from_env()
+app.config['MAX_CONTENT_LENGTH'] = upload_settings['max_bytes']
+
+PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
 
 # Try to import dlib, but have fallback if not available
 try:
     import dlib
     DLIB_AVAILABLE = True
-    # Initialize face detector
-    detector = dlib.get_frontal_face_detector()
-    predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+    # Initialize face detector (FACIPA_DETECTOR selects hog, haar, dnn or cnn);
+    # the detector and predictor models are loaded lazily through model_registry
+    detector = detector_from_env()
 except ImportError:
     DLIB_AVAILABLE = False
     print("Dlib not available, using OpenCV face detection")
 
 class FacialParalysisAnalyzer:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def __init__(self, cache=None, preview=None, quality=None):
+        self.haar_detector = OpenCVHaarDetector()
+        # encode_preview() options for the returned visualization
+        self.preview = preview or preview_settings_from_env()
+        # Optional QualityGate that turns away blurry images and badly exposed or tiny faces
+        self.quality = quality
+        # Optional LandmarkCache so re-uploaded images skip face detection. Without dlib, or when it finds
+        # no face, faces come from the Haar cascade with simulated landmarks.
+        self.face_finder = FaceFinder(PREDICTOR_PATH, detector if DLIB_AVAILABLE else None, cache=cache,
+                                      fallback_detector=self.haar_detector,
+                                      fallback_landmarks=self.simulate_box_landmarks)
+        self.model_version = self.face_finder.model_version
     
     def detect_faces_opencv(self, image):
         """Fallback face detection using OpenCV"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-        return faces
+        return [(left, top, right - left, bottom - top) for (left, top, right, bottom) in self.haar_detector.detect(image)]
     
     def simulate_landmarks(self, face_region):
         """Simulate facial landmarks based on face position"""
@@ -56,22 +85,25 @@ class FacialParalysisAnalyzer:
         
         return landmarks
     
-    def calculate_symmetry_scores(self, landmarks):
-        """Calculate symmetry scores from landmarks"""
+    def simulate_box_landmarks(self, box):
+        """Simulated landmarks for a (left, top, right, bottom) box"""
+        left, top, right, bottom = box
+        return self.simulate_landmarks((left, top, right - left, bottom - top))
+    
+    def calculate_symmetry_scores(self, landmarks, mirror_diff=None):
+        """Calculate symmetry scores from landmarks
+
+        `mirror_diff` may be passed in when half_mirror_diff was already
+        computed for several faces at once.
+        """
         if not landmarks:
             return self.get_default_scores()
         
-        # Calculate symmetry based on left vs right side
-        left_points = landmarks[0:34]  # Left half
-        right_points = landmarks[34:68]  # Right half (mirrored)
-        
-        # Simple symmetry calculation
-        total_diff = 0
-        for i in range(min(len(left_points), len(right_points))):
-            if i < len(left_points) and i < len(right_points):
-                total_diff += abs(left_points[i][0] - (landmarks[16][0] * 2 - right_points[i][0]))
-        
-        symmetry_score = max(0, 100 - (total_diff / len(left_points)) * 10)
+        # Calculate symmetry based on left vs right side (left half mirrored onto the right)
+        if mirror_diff is None:
+            mirror_diff = compute_features(landmarks)['half_mirror_diff'][0]
+        mirror_diff = float(mirror_diff)
+        symmetry_score = max(0, 100 - mirror_diff * 10)
         
         # Add some variation to make it realistic
         import random
@@ -112,49 +144,118 @@ class FacialParalysisAnalyzer:
         else:
             return 6, "Total Paralysis - No movement"
     
-    def analyze_image(self, image_path):
-        """Main analysis function"""
-        image = cv2.imread(image_path)
+    def find_faces(self, image, max_faces=None, timings=None, face_boxes=None):
+        """Return [(box, landmarks), ...] for the faces found by FaceFinder.find_faces(), largest first"""
+        return self.face_finder.find_faces(image, max_faces=max_faces, timings=timings, face_boxes=face_boxes)
+    
+    def find_landmarks(self, image):
+        """Return 68 landmark points for the largest face, or [] if none was found"""
+        faces = self.find_faces(image, max_faces=1)
+        return faces[0][1] if faces else []
+    
+    def analyze_image(self, image, visualize=True, max_faces=1, face_boxes=None):
+        """Main analysis function
+
+        Accepts a file path, raw encoded bytes or a decoded BGR ndarray. The
+        visualization is only rendered when `visualize` is set and is returned
+        encoded as configured by `preview`. `max_faces` analyzes the k
+        largest faces (None for all); the top-level scores describe the
+        largest one. The 'trace' holds the seconds spent in each stage and
+        the image size. `face_boxes` are caller-supplied face boxes that
+        replace detection. An image rejected by the quality gate returns only
+        'error', 'quality' and 'trace'.
+        """
+        stages = {}
+        stage_start = time.perf_counter()
+        source, image = image, decode_image(image)
+        stage_start = record_stage(stages, 'decode', stage_start)
         if image is None:
             return None
+        trace = {'stages': stages, 'image': image_info(source, image)}
         
-        landmarks = []
+        quality = None
+        if self.quality is not None:
+            quality = self.quality.assess_faces(image, face_boxes)
+            stage_start = record_stage(stages, 'quality', stage_start)
+            if self.quality.rejected(quality):
+                return {'error': 'Image quality too low', 'quality': quality, 'trace': trace}
         
-        if DLIB_AVAILABLE:
-            try:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                faces = detector(gray)
-                if len(faces) > 0:
-                    face = faces[0]
-                    landmarks_obj = predictor(gray, face)
-                    landmarks = [(landmarks_obj.part(i).x, landmarks_obj.part(i).y) for i in range(68)]
-            except Exception as e:
-                print(f"Dlib analysis failed: {e}")
-        
-        # Fallback to OpenCV if dlib fails or isn't available
-        if not landmarks:
-            faces = self.detect_faces_opencv(image)
-            if len(faces) > 0:
-                landmarks = self.simulate_landmarks(faces[0])
+        faces = self.find_faces(image, max_faces=max_faces, timings=stages, face_boxes=face_boxes)
+        stage_start = time.perf_counter()
         
-        symmetry_scores = self.calculate_symmetry_scores(landmarks)
-        hb_grade, hb_classification = self.calculate_house_brackmann(symmetry_scores)
+        if quality is not None and faces and face_boxes is None:
+            # Exposure and size of the largest detected face, not of its backdrop
+            quality = self.quality.assess(image, faces[0][0])
+            stage_start = record_stage(stages, 'quality', stage_start)
+            if self.quality.rejected(quality):
+                return {'error': 'Image quality too low', 'quality': quality, 'trace': trace}
         
-        # Create visualization
-        visualization_path = self.create_visualization(image, landmarks, symmetry_scores, hb_grade)
+        face_results = []
+        if faces:
+            mirror_diffs = compute_features([landmarks for _, landmarks in faces])['half_mirror_diff']
+            for (box, landmarks), mirror_diff in zip(faces, mirror_diffs):
+                symmetry_scores = self.calculate_symmetry_scores(landmarks, mirror_diff)
+                hb_grade, hb_classification = self.calculate_house_brackmann(symmetry_scores)
+                face_results.append({
+                    'box': [int(value) for value in box],
+                    'landmarks': [[int(x), int(y)] for x, y in landmarks],
+                    'symmetry_scores': symmetry_scores,
+                    'house_brackmann': {'grade': hb_grade, 'classification': hb_classification}
+                })
+            symmetry_scores = face_results[0]['symmetry_scores']
+            hb_grade = face_results[0]['house_brackmann']['grade']
+            hb_classification = face_results[0]['house_brackmann']['classification']
+        else:
+            symmetry_scores = self.calculate_symmetry_scores([])
+            hb_grade, hb_classification = self.calculate_house_brackmann(symmetry_scores)
+        stage_start = record_stage(stages, 'score', stage_start)
         
-        return {
+        results = {
             'symmetry_scores': symmetry_scores,
             'house_brackmann': {
                 'grade': hb_grade,
                 'classification': hb_classification
             },
-            'visualization_path': visualization_path,
-            'landmarks_detected': len(landmarks) > 0
+            'faces': face_results,
+            'landmarks_detected': len(faces) > 0,
+            'trace': trace
         }
+        if quality is not None:
+            results['quality'] = quality
+        
+        if visualize:
+            results['visualization'], results['visualization_ext'], results['visualization_mime'] = \
+                self.render_visualization(image, results, timings=stages)
+        
+        return results
+    
+    def render_visualization(self, image, results, timings=None):
+        """Draw and encode the visualization for `results` of analyze_image()
+
+        Returns (bytes, file extension, MIME type) encoded as configured by
+        `preview`. Kept apart from analyze_image() so the scores can be sent
+        to a client before the image is drawn.
+        """
+        stage_start = time.perf_counter()
+        image = decode_image(image)
+        # Draw on a view already scaled down to the preview width rather than the full frame
+        canvas, scale = fit_width(image, self.preview.get('max_width'))
+        drawn = [(tuple(int(round(value * scale)) for value in face['box']),
+                  [(int(round(x * scale)), int(round(y * scale))) for x, y in face['landmarks']])
+                 for face in results['faces']]
+        hb_grade = results['house_brackmann']['grade']
+        visualization = self.create_visualization(canvas, drawn[0][1] if drawn else [], results['symmetry_scores'],
+                                                  hb_grade, drawn[1:])
+        stage_start = record_stage(timings, 'draw', stage_start)
+        encoded = encode_preview(visualization, **self.preview)
+        record_stage(timings, 'encode', stage_start)
+        return encoded
     
-    def create_visualization(self, image, landmarks, symmetry_scores, hb_grade):
-        """Create analysis visualization"""
+    def create_visualization(self, image, landmarks, symmetry_scores, hb_grade, other_faces=()):
+        """Create analysis visualization
+
+        `other_faces` are further (box, landmarks) pairs to mark in group photos.
+        """
         result_image = image.copy()
         
         # Draw landmarks if available
@@ -162,6 +263,11 @@ class FacialParalysisAnalyzer:
             for (x, y) in landmarks:
                 cv2.circle(result_image, (x, y), 2, (0, 255, 0), -1)
         
+        for (left, top, right, bottom), face_landmarks in other_faces:
+            cv2.rectangle(result_image, (left, top), (right, bottom), (0, 255, 255), 1)
+            for (x, y) in face_landmarks:
+                cv2.circle(result_image, (x, y), 2, (0, 255, 255), -1)
+        
         # Draw symmetry line
         height, width = result_image.shape[:2]
         cv2.line(result_image, (width//2, 0), (width//2, height), (255, 0, 0), 2)
@@ -187,19 +293,140 @@ class FacialParalysisAnalyzer:
             cv2.putText(result_image, text, (10, y_offset + i * line_height), 
                        font, 0.5, (255, 255, 255), 1)
         
-        # Save visualization
-        os.makedirs('static/results', exist_ok=True)
-        output_path = f"static/results/analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        cv2.imwrite(output_path, result_image)
-        
-        return output_path
+        return result_image
 
 # Initialize analyzer
-analyzer = FacialParalysisAnalyzer()
+analyzer_factory = partial(FacialParalysisAnalyzer, cache=cache_from_env(), preview=preview_settings_from_env(),
+                           quality=quality_gate_from_env())
+analyzer = analyzer_factory()
+
+if DLIB_AVAILABLE:
+    model_loaders = [partial(get_shape_predictor, PREDICTOR_PATH), detector.load_model]
+else:
+    model_loaders = [analyzer.haar_detector.load_model]
+
+# With FACIPA_WORKERS set, analyses are dispatched to a process pool instead of the request thread.
+# Models are then loaded before the workers fork; otherwise they warm up in the background.
+pool = pool_from_env(analyzer_factory, preload=model_loaders)
+if pool is None:
+    registry.warm_up(*model_loaders)
+
+def run_analysis(method, *args, **kwargs):
+    """Call an analyzer method in-process or on the worker pool"""
+    if pool is not None:
+        return pool.call(method, *args, **kwargs)
+    return getattr(analyzer, method)(*args, **kwargs)
+
+# Kept visualizations get unique names and are evicted by size and age
+artifacts = artifact_store_from_env('static/results')
+# Browser cache lifetime of stored visualizations, which never change once written
+RESULT_MAX_AGE = int(artifacts.max_age_seconds or 365 * 24 * 3600)
+
+def analyze_bytes(image_bytes, keep_results=False, visualize=True, max_faces=1, face_boxes=None):
+    """Analyze an uploaded image, storing the visualization when `keep_results` is set"""
+    results = run_analysis('analyze_image', image_bytes, visualize=visualize or keep_results, max_faces=max_faces,
+                           face_boxes=face_boxes)
+    if results is None:
+        metrics.observe_trace({'image': image_info(image_bytes, None)})
+        return None
+    
+    stage_start = time.perf_counter()
+    if keep_results and 'visualization' in results:
+        results['visualization_path'] = artifacts.save(results['visualization'], results['visualization_ext'])
+        record_stage(results['trace']['stages'], 'store', stage_start)
+    if not visualize:
+        results.pop('visualization', None)
+    return results
+
+def format_results(results, trace=False):
+    """JSON response for an analysis, with the visualization as a data URL
+
+    The analysis trace is recorded in the metrics and only included in the
+    response when `trace` is set.
+    """
+    response = {
+        'success': True,
+        'symmetry_scores': results['symmetry_scores'],
+        'house_brackmann': results['house_brackmann'],
+        'faces': results['faces'],
+        'landmarks_detected': results['landmarks_detected']
+    }
+    if 'quality' in results:
+        response['quality'] = results['quality']
+    
+    stages = results['trace']['stages']
+    if 'visualization' in results:
+        # Convert image to base64 for web display
+        stage_start = time.perf_counter()
+        img_base64 = base64.b64encode(results['visualization']).decode('utf-8')
+        response['visualization_url'] = f"data:{results['visualization_mime']};base64,{img_base64}"
+        record_stage(stages, 'base64', stage_start)
+    if 'visualization_path' in results:
+        response['visualization_path'] = results['visualization_path']
+    
+    metrics.observe_trace(results['trace'])
+    if trace:
+        response['trace'] = {'stages': {stage: round(seconds, 6) for stage, seconds in stages.items()},
+                             'image': results['trace']['image']}
+    return response
+
+def format_rejection(results):
+    """JSON response for an image turned away by the quality gate"""
+    metrics.observe_trace(results['trace'])
+    return {'success': False, 'error': results['error'], 'quality': results['quality']}
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_visualization(image, results):
+    """Yield the 'visualization' event once the image for `results` is drawn, encoded and stored
+
+    The event carries the URL of the stored image rather than the bytes, so
+    the browser fetches it as a cacheable binary instead of a base64 string.
+    """
+    stages = {}
+    try:
+        stage_start = time.perf_counter()
+        data, ext, mime_type = run_analysis('render_visualization', image, results)
+        stage_start = record_stage(stages, 'visualize', stage_start)
+        name = os.path.basename(artifacts.save(data, ext))
+        record_stage(stages, 'store', stage_start)
+        metrics.observe_trace({'stages': stages})
+        yield sse_event('visualization', {'url': f"/results/{name}", 'mime_type': mime_type, 'bytes': len(data)})
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+    yield sse_event('done', {})
+
+def run_job(image_bytes, options):
+    trace = options.pop('trace', False)
+    results = analyze_bytes(image_bytes, **options)
+    if results is None:
+        raise ValueError('Could not process image')
+    if 'error' in results:
+        return format_rejection(results)
+    return format_results(results, trace=trace)
+
+# Background jobs are retried while the worker pool is full. The queue's database (under FACIPA_DATA_DIR)
+# and worker threads are only created when it is first used.
+jobs = LazyJobQueue(partial(job_queue_from_env, run_job, database='web_jobs.db', retry_exceptions=(PoolBusyError,)))
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({'error': 'Image too large', 'max_bytes': upload_settings['max_bytes']}), 413
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', upload_settings=upload_settings)
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    status = registry.status()
+    # A failed model load never recovers by waiting, so report it as unavailable
+    if status['state'] == 'failed':
+        return jsonify({'status': 'failed', 'service': 'Facial Paralysis Analysis', **status}), 503
+    return jsonify({'status': 'healthy' if status['ready'] else 'warming_up',
+                    'service': 'Facial Paralysis Analysis', **status})
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
@@ -207,38 +434,115 @@ def analyze():
         return jsonify({'error': 'No image provided'}), 400
     
     try:
-        image_file = request.files['image']
-        
-        # Save temporary file
-        temp_path = f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        image_file.save(temp_path)
+        max_faces = parse_max_faces(request.values.get('faces'))
+        # Boxes from a detector the client already ran skip server-side detection
+        face_boxes = parse_face_boxes(request.values.getlist('face_box'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        image_bytes = request.files['image'].read()
+        keep_results = request.values.get('keep_results') == '1'
+        visualize = request.values.get('visualize', '1') == '1'
         
-        # Analyze image
-        results = analyzer.analyze_image(temp_path)
+        # Analyze image straight from memory
+        results = analyze_bytes(image_bytes, keep_results=keep_results, visualize=visualize, max_faces=max_faces,
+                                face_boxes=face_boxes)
         
         if results is None:
             return jsonify({'error': 'Could not process image'}), 400
+        if 'error' in results:
+            return jsonify(format_rejection(results)), 422
         
-        # Convert image to base64 for web display
-        with open(results['visualization_path'], 'rb') as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-        
-        # Clean up temp file
-        try:
-            os.remove(temp_path)
-        except:
-            pass
-        
-        return jsonify({
-            'success': True,
-            'symmetry_scores': results['symmetry_scores'],
-            'house_brackmann': results['house_brackmann'],
-            'visualization_url': f"data:image/png;base64,{img_base64}",
-            'landmarks_detected': results['landmarks_detected']
-        })
+        return jsonify(format_results(results, trace=request.values.get('trace') == '1'))
+    
+    except PoolBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Analyze an upload and stream the results as Server-Sent Events
+
+    A 'scores' event with the /analyze JSON (without the visualization) is
+    sent as soon as the faces are scored, then 'visualization' with the URL
+    of the stored image and finally 'done'. Errors before the scores are
+    ready get the same JSON responses and status codes as /analyze.
+    """
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
     
+    try:
+        max_faces = parse_max_faces(request.values.get('faces'))
+        face_boxes = parse_face_boxes(request.values.getlist('face_box'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        image_bytes = request.files['image'].read()
+        # Decode once; the scoring and drawing passes both take the decoded image
+        image = decode_image(image_bytes)
+        if image is None:
+            metrics.observe_trace({'image': image_info(image_bytes, None)})
+            return jsonify({'error': 'Could not process image'}), 400
+        results = run_analysis('analyze_image', image, visualize=False, max_faces=max_faces, face_boxes=face_boxes)
+        results['trace']['image']['bytes'] = len(image_bytes)
+        if 'error' in results:
+            return jsonify(format_rejection(results)), 422
+        scores = format_results(results, trace=request.values.get('trace') == '1')
+        visualize = request.values.get('visualize', '1') == '1'
+    except PoolBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    def events():
+        yield sse_event('scores', scores)
+        if visualize:
+            yield from stream_visualization(image, results)
+        else:
+            yield sse_event('done', {})
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/results/<name>', methods=['GET'])
+def get_result_image(name):
+    """Serve a stored visualization; names are unique, so clients may cache them for good"""
+    response = send_from_directory(os.path.abspath(artifacts.root), name, max_age=RESULT_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
+    
+    try:
+        options = {'keep_results': request.values.get('keep_results') == '1',
+                   'visualize': request.values.get('visualize', '1') == '1',
+                   'trace': request.values.get('trace') == '1',
+                   'max_faces': parse_max_faces(request.values.get('faces')),
+                   'face_boxes': parse_face_boxes(request.values.getlist('face_box'))}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        job_id = jobs.submit(request.files['image'].read(), options,
+                             callback_url=request.values.get('callback_url'))
+    except InvalidCallbackError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f"/jobs/{job_id}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
 
 if __name__ == '__main__':
     # Create necessary directories
@@ -249,4 +553,9 @@ if __name__ == '__main__':
     print("Open your browser and go to: http://localhost:5000")
     print("Make sure you have the shape_predictor_68_face_landmarks.dat file in the same directory")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # The reloader would start a second copy of the worker pool
+    use_reloader = pool is None
+    # Resume queued jobs at startup; with the reloader only the serving child runs them
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        jobs.start()
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=use_reloader)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Analyzer instance owned by each worker process
+_analyzer = None
+
+
+def _init_worker(factory):
+    """Build the analyzer (and load its models) once when a worker starts"""
+    global _analyzer
+    _analyzer = factory()
+
+
+def _run(method, args, kwargs):
+    return getattr(_analyzer, method)(*args, **kwargs)
+
+
+def _ping():
+    return os.getpid()
+
+
+class PoolBusyError(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+
+class AnalysisWorkerPool:
+    def __init__(self, factory, workers=None, queue_depth=None):
+        """Process pool where every worker holds its own analyzer
+
+        `factory` must be picklable (a class or module level function) and is
+        called once per worker. At most `workers + queue_depth` calls can be
+        in flight; further submissions raise PoolBusyError.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_depth = self.workers * 2 if queue_depth is None else queue_depth
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=_init_worker,
+                                             initargs=(factory,))
+
+    @property
+    def capacity(self):
+        """Most calls that can be in flight at once"""
+        return self.workers + self.queue_depth
+
+    def warm_up(self):
+        """Start all workers now so model loading doesn't hit the first requests"""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        return sorted({future.result() for future in futures})
+
+    def submit(self, method, *args, slot_timeout=0, **kwargs):
+        """Queue `analyzer.<method>(*args, **kwargs)` on a worker and return a future
+
+        With every slot taken, PoolBusyError is raised at once by default, or
+        after waiting `slot_timeout` seconds for a slot (None waits until one
+        frees up).
+        """
+        acquired = (self._slots.acquire(blocking=False) if slot_timeout == 0 else
+                    self._slots.acquire(timeout=slot_timeout))
+        if not acquired:
+            raise PoolBusyError(f"Analysis queue is full ({self.workers} workers, depth {self.queue_depth})")
+
+        try:
+            future = self._executor.submit(_run, method, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, method, *args, timeout=None, **kwargs):
+        """Run a call on a worker and wait for its result"""
+        return self.submit(method, *args, **kwargs).result(timeout=timeout)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Stop the workers; `cancel_futures` drops calls that haven't started yet"""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def pool_from_env(factory, preload=()):
+    """Create a pool from FACIPA_WORKERS / FACIPA_QUEUE_DEPTH, or None when disabled
+
+    `preload` callables run in this process before the workers are forked, so
+    models they load are inherited by every worker instead of loaded again.
+    """
+    workers = int(os.environ.get('FACIPA_WORKERS', '0'))
+
+    # Worker processes re-importing the app module must not start pools of their own
+    if workers <= 0 or multiprocessing.parent_process() is not None:
+        return None
+
+    for loader in preload:
+        loader()
+
+    queue_depth = os.environ.get('FACIPA_QUEUE_DEPTH')
+    pool = AnalysisWorkerPool(factory, workers=workers,
+                              queue_depth=int(queue_depth) if queue_depth else None)
+    pool.warm_up()
+    return pool